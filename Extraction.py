@@ -1,174 +1,887 @@
 # coding: utf-8
 import argparse
+import concurrent.futures as cf
+import hashlib
+import io
 import os
 import re
 import json
-from urllib.parse import urlparse
+import shutil
+import tempfile
+import threading
+import time
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
 from pathlib import Path
 from abc import ABC, abstractmethod
-from typing import Optional, Union
+from dataclasses import dataclass, field, replace
+from typing import TYPE_CHECKING, Iterator, Optional, Union
 
 import requests
-from bs4 import BeautifulSoup
-from PyPDF2 import PdfReader
-from youtube_transcript_api import YouTubeTranscriptApi as YT, NoTranscriptFound, TranscriptsDisabled
-from trafilatura import fetch_url, extract as trafilatura_extract
-import nbformat
-from pdf2image import convert_from_path
-from PIL import Image
-import pytesseract
-from mistralai import Mistral, DocumentURLChunk
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
-import pandas as pd
+from dedup import MIN_WORDS, DuplicateIndex, SimHasher, canonical_url
+from disk_cache import DiskCache, cache_key
+import instrumentation
+import profiling
+from instrumentation import span
+from manifest import BatchManifest, RESUME, RETRY_FAILED, FORCE
+from pages_io import FORMATS, PagesWriter, estimate_tokens
+
+# Les dépendances lourdes (PyPDF2, bs4, trafilatura, nbformat, pdf2image,
+# pytesseract, numpy, mistralai, pandas...) sont importées dans les extracteurs
+# qui s'en servent : une URL web simple ne paie pas le chargement de l'OCR.
+if TYPE_CHECKING:
+    from PIL import Image
+    from PyPDF2 import PdfReader
 
 load_dotenv()
 
+# === Session HTTP partagée ===
+@dataclass
+class ExtractionConfig:
+    timeout: float = 30.0
+    retries: int = 3
+    pool_size: int = 10
+    chunk_size: int = 256 * 1024              # taille des morceaux lus en streaming
+    spool_max_bytes: int = 16 * 1024 * 1024   # au-delà, le téléchargement bascule sur disque
+    pdf_workers: int = 1                      # processus pour l'extraction page par page
+    pdf_chunk_size: int = 50                  # pages confiées à chaque tâche
+    page_range: Optional[tuple] = None        # (première, dernière) page, numérotées à partir de 1
+    ocr_workers: int = 1                      # processus Tesseract
+    ocr_dpi: int = 200                        # résolution de rastérisation
+    ocr_window: int = 4                       # pages rastérisées à la fois par tâche
+    ocr_max_width: int = 2000                 # largeur maximale (px) avant OCR
+    ocr_lang: Optional[str] = None            # ex. "fra+eng" ; None = langue par défaut de Tesseract
+    hybrid: bool = False                      # OCR uniquement des pages sans couche texte
+    hybrid_min_chars: int = 100               # en dessous, la page est envoyée à l'OCR
+    hybrid_engine: str = "mistral"            # "mistral" ou "tesseract"
+    mistral_inflight: int = 4                 # appels OCR Mistral simultanés
+    ocr_cache_dir: Optional[str] = ".cache/ocr"  # résultats OCR par SHA-256 ; None = désactivé
+    html_engines: tuple = ("trafilatura", "lxml", "bs4")  # ordre d'essai des moteurs HTML
+    html_min_chars: int = 200                 # texte minimal pour accepter un moteur
+    cache_max_entry_chars: int = 20_000_000   # documents plus gros : écrits sans être mis en cache
+    youtube_inflight: int = 8                 # requêtes YouTube (titre, transcription) simultanées
+    youtube_languages: tuple = ("fr", "en")   # langues de transcription, par ordre de préférence
+    youtube_cache_dir: Optional[str] = ".cache/youtube"  # titres et transcriptions ; None = désactivé
+
+class TimeoutSession(requests.Session):
+    """Session requests qui applique un timeout par défaut à chaque appel."""
+
+    def __init__(self, timeout: float):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, **kwargs)
+
+def http_validators(headers) -> dict:
+    """ETag / Last-Modified d'une réponse, pour la revalidation du cache."""
+    validators = {}
+    if headers.get("ETag"):
+        validators["etag"] = headers["ETag"]
+    if headers.get("Last-Modified"):
+        validators["last_modified"] = headers["Last-Modified"]
+    return validators
+
+# Validateurs de la première réponse GET du document en cours d'extraction (par thread)
+_fetch_validators = threading.local()
+
+def _record_validators(response, *args, **kwargs):
+    seen = getattr(_fetch_validators, "current", None)
+    if seen is not None and not seen and response.request.method == "GET" and response.status_code == 200:
+        seen.update(http_validators(response.headers))
+
+def build_session(config: ExtractionConfig) -> requests.Session:
+    """Crée une session avec pool de connexions, keep-alive, compression et retries."""
+    session = TimeoutSession(config.timeout)
+    retry = Retry(
+        total=config.retries,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD"}),
+    )
+    adapter = HTTPAdapter(pool_connections=config.pool_size, pool_maxsize=config.pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    # ACCEPT_ENCODING inclut br/zstd uniquement si brotli/zstandard sont installés
+    session.headers.update({"User-Agent": "Mozilla/5.0", "Accept-Encoding": ACCEPT_ENCODING})
+    session.hooks["response"].append(_record_validators)
+    return session
+
+_shared_session: Optional[requests.Session] = None
+_shared_session_lock = threading.Lock()
+
+def get_session() -> requests.Session:
+    """Retourne la session partagée par défaut (créée au premier appel)."""
+    global _shared_session
+    with _shared_session_lock:
+        if _shared_session is None:
+            _shared_session = build_session(ExtractionConfig())
+        return _shared_session
+
+def download(session: requests.Session, url: str, config: ExtractionConfig) -> tempfile.SpooledTemporaryFile:
+    """Télécharge `url` par morceaux.
+
+    Le contenu reste en mémoire tant qu'il est plus petit que `config.spool_max_bytes`,
+    puis bascule sur un fichier temporaire unique : la mémoire reste bornée et
+    deux workers ne se marchent plus dessus.
+    """
+    buffer = tempfile.SpooledTemporaryFile(max_size=config.spool_max_bytes)
+    try:
+        with span("download") as s, session.get(url, stream=True) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=config.chunk_size):
+                buffer.write(chunk)
+                s.add(bytes=len(chunk))
+    except BaseException:
+        buffer.close()
+        raise
+    buffer.seek(0)
+    return buffer
+
+# === Registre des extracteurs ===
+EXTRACTORS: dict = {}
+PLUGIN_GROUP = "podcastify.extractors"
+_plugins_loaded = False
+_plugins_lock = threading.Lock()
+PLUGIN_SOURCES: list = []  # types de source chargés depuis les entry points, dans l'ordre
+
+def register_extractor(*sources: str):
+    """Décorateur : associe une classe d'extracteur à un ou plusieurs types de source."""
+    def decorator(cls):
+        for source in sources:
+            EXTRACTORS[source] = cls
+        return cls
+    return decorator
+
+def load_plugins():
+    """Charge les extracteurs déclarés par d'autres paquets (entry points `podcastify.extractors`).
+
+    Le nom de l'entry point est le type de source, sa valeur la classe, ex. :
+    `[project.entry-points."podcastify.extractors"] docx = "mon_paquet.docx:DocxExtractor"`.
+    La classe peut définir une méthode de classe `matches(url) -> bool` : `detect_source`
+    la consulte avant la détection intégrée, ce qui permet au plugin de prendre en
+    charge ses propres URLs. Le chargement n'a lieu qu'une fois, au premier appel.
+    """
+    global _plugins_loaded
+    if _plugins_loaded:
+        return
+    with _plugins_lock:  # appelé depuis les workers d'extraction
+        if _plugins_loaded:
+            return
+        from importlib.metadata import entry_points
+
+        for entry_point in entry_points(group=PLUGIN_GROUP):
+            if entry_point.name in EXTRACTORS:
+                continue
+            try:
+                EXTRACTORS[entry_point.name] = entry_point.load()
+                PLUGIN_SOURCES.append(entry_point.name)
+            except Exception as e:
+                print(f"⚠️ Extracteur '{entry_point.name}' non chargé : {e}")
+        _plugins_loaded = True
+
+def plugin_source(url: str) -> Optional[str]:
+    """Type de source du premier plugin dont `matches(url)` accepte l'URL."""
+    load_plugins()
+    for source in PLUGIN_SOURCES:
+        matches = getattr(EXTRACTORS.get(source), "matches", None)
+        if matches is None:
+            continue
+        try:
+            if matches(url):
+                return source
+        except Exception as e:
+            print(f"⚠️ Extracteur '{source}' : matches() a échoué ({e})")
+    return None
+
 # === Extracteurs ===
 class TextExtractor(ABC):
+    def __init__(self, config: Optional[ExtractionConfig] = None, session: Optional[requests.Session] = None):
+        self.config = config or ExtractionConfig()
+        self.session = session or get_session()
+
     @abstractmethod
     def extract(self, url: str) -> Optional[Union[str, dict]]:
         pass
 
+    def extract_iter(self, url: str) -> Iterator[dict]:
+        """Version générateur de `extract` : produit le document morceau par morceau
+        (page, cellule, segment...) sous la forme {"index", "text", ...métadonnées}.
+
+        Par défaut, s'appuie sur `extract` : un morceau par page si le résultat
+        en contient (OCR), sinon un seul morceau avec tout le texte.
+        """
+        result = self.extract(url)
+        if isinstance(result, dict):
+            if result.get("pages"):
+                for n, page in enumerate(result["pages"]):
+                    chunk = {"index": page.get("index", n), "text": page.get("markdown", "")}
+                    if "method" in page:
+                        chunk["method"] = page["method"]
+                    yield chunk
+            elif result.get("text"):
+                yield {"index": 0, "text": result["text"]}
+        elif result:
+            yield {"index": 0, "text": result}
+
+    def title(self, url: str) -> Optional[str]:
+        """Titre du document s'il est connu avant l'extraction (sinon le nom du fichier est utilisé)."""
+        return None
+
+YOUTUBE_ID_RE = re.compile(
+    r"(?:youtube(?:-nocookie)?\.com/(?:watch\?(?:.*&)?v=|shorts/|embed/|live/|v/)|youtu\.be/)([A-Za-z0-9_-]{11})"
+)
+
+def extract_video_id(url: str) -> Optional[str]:
+    """Identifiant d'une vidéo YouTube : watch?v=, shorts/, embed/, live/ ou youtu.be/."""
+    match = YOUTUBE_ID_RE.search(url)
+    return match.group(1) if match else None
+
+class YouTubeService:
+    """Titres et transcriptions YouTube partagés par tout le lot : mis en cache par
+    identifiant de vidéo (et langues pour les transcriptions), appels simultanés
+    bornés, et une même vidéo n'est jamais demandée deux fois en parallèle.
+    """
+
+    def __init__(self, cache_dir: Optional[str], max_inflight: int, languages: tuple):
+        self.languages = tuple(languages)
+        self.max_inflight = max(1, max_inflight)
+        self.titles = DiskCache(Path(cache_dir) / "titles", ttl=None) if cache_dir else None
+        self.transcripts = DiskCache(Path(cache_dir) / "transcripts", ttl=None) if cache_dir else None
+        self._inflight = threading.BoundedSemaphore(self.max_inflight)
+        self._memo = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    def _cached(self, cache: Optional[DiskCache], key: str, fetch):
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        # Un second appel pour la même vidéo attend le premier puis relit le résultat
+        with key_lock:
+            if key in self._memo:
+                return self._memo[key]
+            value = cache.get(key) if cache is not None else None
+            instrumentation.count("cache", cache="youtube", result="miss" if value is None else "hit")
+            if value is None:
+                with self._inflight:
+                    value = fetch()
+                if value is not None and cache is not None:
+                    cache.set(key, value)
+            self._memo[key] = value
+            return value
+
+    def title(self, video_id: str, session: requests.Session) -> Optional[str]:
+        return self._cached(self.titles, cache_key("title", video_id),
+                            lambda: self._fetch_title(video_id, session))
+
+    def transcript(self, video_id: str) -> Optional[list]:
+        return self._cached(self.transcripts, cache_key("transcript", video_id, self.languages),
+                            lambda: self._fetch_transcript(video_id))
+
+    def prefetch(self, video_ids: list, session: requests.Session):
+        """Lance en arrière-plan titres et transcriptions de tout un lot.
+
+        Les extracteurs qui demandent ensuite une de ces vidéos attendent la requête
+        en cours au lieu d'en refaire une ; une erreur ici est simplement ignorée et
+        l'extracteur la rencontrera à nouveau en réessayant.
+        """
+        executor = cf.ThreadPoolExecutor(max_workers=self.max_inflight, thread_name_prefix="youtube")
+        for video_id in dict.fromkeys(video_ids):
+            executor.submit(self.title, video_id, session)
+            executor.submit(self.transcript, video_id)
+        executor.shutdown(wait=False)
+
+    @staticmethod
+    def _fetch_title(video_id: str, session: requests.Session) -> Optional[str]:
+        try:
+            oembed_url = f"https://www.youtube.com/oembed?url=https://www.youtube.com/watch?v={video_id}&format=json"
+            with span("api", api="youtube_oembed"):
+                response = session.get(oembed_url)
+                response.raise_for_status()
+                return response.json().get("title")
+        except (requests.RequestException, ValueError):
+            return None
+
+    def _fetch_transcript(self, video_id: str) -> Optional[list]:
+        """Segments horodatés de la transcription dans la première langue disponible."""
+        from youtube_transcript_api import YouTubeTranscriptApi as YT, NoTranscriptFound, TranscriptsDisabled
+
+        try:
+            with span("api", api="youtube_transcript") as s:
+                transcript = YT.list_transcripts(video_id).find_transcript(list(self.languages))
+                segments = [
+                    {"text": entry["text"], "start": entry["start"], "duration": entry["duration"]}
+                    for entry in transcript.fetch()
+                ]
+                s.add(chars=sum(len(entry["text"]) for entry in segments))
+                return segments
+        except (NoTranscriptFound, TranscriptsDisabled):
+            return None
+
+_youtube_service: Optional[YouTubeService] = None
+_youtube_service_lock = threading.Lock()
+
+def youtube_service(config: ExtractionConfig) -> YouTubeService:
+    """Service YouTube partagé par le processus (créé au premier appel)."""
+    global _youtube_service
+    with _youtube_service_lock:
+        if _youtube_service is None:
+            _youtube_service = YouTubeService(config.youtube_cache_dir, config.youtube_inflight,
+                                              config.youtube_languages)
+        return _youtube_service
+
+@register_extractor("youtube")
 class VideoExtractor(TextExtractor):
     def extract(self, url: str) -> Optional[dict]:
         video_id = self.extract_video_id(url)
         if not video_id:
             return None
         title = self.get_youtube_title(video_id)
-        try:
-            transcript_list = YT.list_transcripts(video_id)
-            try:
-                transcript = transcript_list.find_transcript(['fr'])
-            except NoTranscriptFound:
-                transcript = transcript_list.find_transcript(['en'])
-            text = " ".join([entry["text"] for entry in transcript.fetch()])
-            return {"title": title, "text": text}
-        except (NoTranscriptFound, TranscriptsDisabled):
+        segments = self.fetch_transcript(video_id)
+        if segments is None:
             return None
+        text = " ".join([entry["text"] for entry in segments])
+        return {"title": title, "text": text}
+
+    def extract_iter(self, url: str) -> Iterator[dict]:
+        video_id = self.extract_video_id(url)
+        if not video_id:
+            return
+        for i, entry in enumerate(self.fetch_transcript(video_id) or []):
+            yield {"index": i, "text": entry["text"], "start": entry["start"], "duration": entry["duration"]}
+
+    def title(self, url: str) -> Optional[str]:
+        video_id = self.extract_video_id(url)
+        return self.get_youtube_title(video_id) if video_id else None
+
+    def fetch_transcript(self, video_id: str) -> Optional[list]:
+        """Segments horodatés de la transcription (langues `config.youtube_languages`)."""
+        return youtube_service(self.config).transcript(video_id)
 
     def extract_video_id(self, url: str) -> Optional[str]:
-        if "v=" in url:
-            return url.split("v=")[1].split("&")[0]
-        elif "youtu.be/" in url:
-            return url.split("youtu.be/")[1].split("?")[0]
-        return None
+        return extract_video_id(url)
 
     def get_youtube_title(self, video_id: str) -> str:
+        return youtube_service(self.config).title(video_id, self.session) or "video"
+
+META_CHARSET_RE = re.compile(rb"<meta[^>]+charset", re.IGNORECASE)
+
+def html_encoding(content: bytes, content_type: Optional[str] = None) -> Optional[str]:
+    """Encodage à imposer aux moteurs HTML.
+
+    Le charset de l'en-tête Content-Type l'emporte ; à défaut, une balise <meta charset>
+    est laissée au parseur (None). Sans l'un ni l'autre, lxml supposerait du latin-1 :
+    on retient utf-8 si le contenu se décode ainsi.
+    """
+    match = re.search(r"charset=[\"']?([\w.:-]+)", content_type or "", re.IGNORECASE)
+    if match:
+        return match.group(1)
+    if META_CHARSET_RE.search(content[:4096]):
+        return None
+    try:
+        content.decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError:
+        return None
+
+def html_text_trafilatura(content: bytes, encoding: Optional[str] = None) -> str:
+    """Contenu principal de la page (trafilatura), sans nouveau téléchargement."""
+    from trafilatura import extract as trafilatura_extract
+
+    if encoding:
+        content = content.decode(encoding, errors="replace")
+    return trafilatura_extract(content) or ""
+
+def html_text_lxml(content: bytes, encoding: Optional[str] = None) -> str:
+    """Texte des <p> en un seul passage lxml, sans construire l'arbre complet."""
+    from lxml import etree
+
+    paragraphs = []
+    for _, element in etree.iterparse(io.BytesIO(content), events=("end",), tag="p", html=True, recover=True,
+                                      encoding=encoding):
+        text = "".join(element.itertext()).strip()
+        if text:
+            paragraphs.append(text)
+        element.clear()
+    return "\n\n".join(paragraphs)
+
+def html_text_bs4(content: bytes, encoding: Optional[str] = None) -> str:
+    """Texte des <p> avec BeautifulSoup, en ne gardant que ces balises (SoupStrainer)."""
+    from bs4 import BeautifulSoup, FeatureNotFound, SoupStrainer
+
+    only_p = SoupStrainer("p")
+    try:
+        soup = BeautifulSoup(content, "lxml", parse_only=only_p, from_encoding=encoding)
+    except FeatureNotFound:
+        soup = BeautifulSoup(content, "html.parser", parse_only=only_p, from_encoding=encoding)
+    return " ".join(p.get_text() for p in soup.find_all("p"))
+
+HTML_ENGINES = {
+    "trafilatura": html_text_trafilatura,
+    "lxml": html_text_lxml,
+    "bs4": html_text_bs4,
+}
+
+def extract_html(content: bytes, engines: tuple, min_chars: int, content_type: Optional[str] = None) -> Optional[str]:
+    """Essaie les moteurs dans l'ordre et garde le premier résultat assez long.
+
+    Si aucun n'atteint `min_chars`, le texte le plus long l'emporte. `content_type`
+    (en-tête HTTP) fournit le charset de la page, voir `html_encoding`.
+    """
+    encoding = html_encoding(content, content_type)
+    best = ""
+    for name in engines:
         try:
-            oembed_url = f"https://www.youtube.com/oembed?url=https://www.youtube.com/watch?v={video_id}&format=json"
-            response = requests.get(oembed_url)
-            return response.json().get("title", "video")
-        except Exception:
-            return "video"
+            with span("parse", engine=name) as s:
+                text = HTML_ENGINES[name](content, encoding)
+                s.add(bytes=len(content), chars=len(text))
+        except Exception as e:
+            print(f"⚠️ Moteur HTML {name} en échec : {e}")
+            continue
+        if len(text.strip()) >= min_chars:
+            return text
+        if len(text) > len(best):
+            best = text
+    return best or None
 
+@register_extractor("trafilatura")
 class TrafilaturaExtractor(TextExtractor):
     def extract(self, url: str) -> Optional[str]:
-        return trafilatura_extract(fetch_url(url))
+        with span("download") as s:
+            response = self.session.get(url)
+            response.raise_for_status()
+            s.add(bytes=len(response.content))
+        return extract_html(response.content, self.config.html_engines, self.config.html_min_chars,
+                            response.headers.get("Content-Type"))
+
+    def extract_iter(self, url: str) -> Iterator[dict]:
+        paragraphs = (p for p in (self.extract(url) or "").split("\n") if p.strip())
+        for i, paragraph in enumerate(paragraphs):
+            yield {"index": i, "text": paragraph}
+
+def parse_page_range(text: str) -> tuple:
+    """Convertit "5-20", "5-", "-20" ou "7" en (première, dernière) page ; None = borne ouverte."""
+    first, sep, last = text.partition("-")
+    first = int(first) if first.strip() else None
+    last = int(last) if last.strip() else None
+    return (first, last) if sep else (first, first)
+
+def resolve_page_range(page_range: Optional[tuple], page_count: int) -> range:
+    """Indices (base 0) des pages à extraire, bornés au nombre de pages du document."""
+    if not page_range:
+        return range(page_count)
+    first, last = page_range
+    start = max((first or 1) - 1, 0)
+    stop = min(last or page_count, page_count)
+    return range(start, max(start, stop))
+
+def _extract_pdf_pages(path: str, start: int, stop: int) -> list:
+    """Worker : ouvre le PDF de son côté et extrait le texte des pages [start, stop)."""
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
 
+@register_extractor("pdf_local")
 class PDFLocalExtractor(TextExtractor):
     def extract(self, url: str) -> Optional[str]:
+        return "".join(chunk["text"] for chunk in self.extract_iter(url))
+
+    def extract_iter(self, url: str) -> Iterator[dict]:
+        from PyPDF2 import PdfReader
+
         reader = PdfReader(url)
-        return "".join(page.extract_text() or "" for page in reader.pages)
+        pages = resolve_page_range(self.config.page_range, len(reader.pages))
+        chunk_size = max(1, self.config.pdf_chunk_size)
+
+        if self.config.pdf_workers <= 1 or len(pages) <= chunk_size:
+            for i in pages:
+                with span("parse", engine="pypdf") as s:
+                    text = reader.pages[i].extract_text() or ""
+                    s.add(pages=1, chars=len(text))
+                yield {"index": i, "text": text}
+            return
 
+        # Chaque worker rouvre le fichier : rien de lourd ne transite entre processus
+        # à part le texte, et les morceaux sont réassemblés dans l'ordre des pages.
+        with cf.ProcessPoolExecutor(max_workers=self.config.pdf_workers) as executor:
+            starts = range(pages.start, pages.stop, chunk_size)
+            futures = [
+                executor.submit(_extract_pdf_pages, url, start, min(start + chunk_size, pages.stop))
+                for start in starts
+            ]
+            for start, future in zip(starts, futures):
+                # Attente du morceau suivant (les workers mesurent hors de ce processus)
+                with span("parse", engine="pypdf_pool") as s:
+                    texts = future.result()
+                    s.add(pages=len(texts), chars=sum(len(t) for t in texts))
+                for offset, text in enumerate(texts):
+                    yield {"index": start + offset, "text": text}
+
+@register_extractor("pdf_telecharge")
 class PDFTelechargeExtractor(TextExtractor):
     def extract(self, url: str) -> Optional[str]:
-        filename = "temp_downloaded.pdf"
-        with open(filename, "wb") as f:
-            f.write(requests.get(url).content)
-        reader = PdfReader(filename)
-        os.remove(filename)
-        return "".join(page.extract_text() or "" for page in reader.pages)
+        return "".join(chunk["text"] for chunk in self.extract_iter(url))
+
+    def extract_iter(self, url: str) -> Iterator[dict]:
+        from PyPDF2 import PdfReader
 
+        with download(self.session, url, self.config) as buffer:
+            reader = PdfReader(buffer)
+            pages = resolve_page_range(self.config.page_range, len(reader.pages))
+            for i in pages:
+                with span("parse", engine="pypdf") as s:
+                    text = reader.pages[i].extract_text() or ""
+                    s.add(pages=1, chars=len(text))
+                yield {"index": i, "text": text}
+
+def preprocess_page(image: "Image.Image", max_width: Optional[int] = None) -> "Image.Image":
+    """Prépare une page pour Tesseract : niveaux de gris, réduction et binarisation (Otsu)."""
+    import numpy as np
+    from PIL import Image
+
+    rgb = np.asarray(image.convert("RGB"), dtype=np.float32)
+    gray = rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+    # Réduction par moyenne de blocs f x f quand la page est trop large
+    if max_width and gray.shape[1] > max_width:
+        f = -(-gray.shape[1] // max_width)
+        h, w = gray.shape[0] // f * f, gray.shape[1] // f * f
+        gray = gray[:h, :w].reshape(h // f, f, w // f, f).mean(axis=(1, 3))
+
+    gray = gray.astype(np.uint8)
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    weights = np.cumsum(hist)
+    means = np.cumsum(hist * np.arange(256))
+    total_weight, total_mean = weights[-1], means[-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (total_mean * weights - means * total_weight) ** 2 / (weights * (total_weight - weights))
+    threshold = int(np.argmax(np.nan_to_num(between, nan=-1.0)))  # page uniforme : seuil 0
+    return Image.fromarray(np.where(gray > threshold, 255, 0).astype(np.uint8))
+
+def _ocr_pdf_window(path: str, first: int, last: int, dpi: int, max_width: Optional[int], lang: Optional[str]) -> list:
+    """Worker : rastérise les pages [first, last] (base 1) puis les passe à Tesseract."""
+    from pdf2image import convert_from_path
+    import pytesseract
+
+    # Mesures visibles seulement quand la fenêtre tourne dans le processus principal (--ocr-workers 1)
+    with span("rasterize", engine="pdf2image") as s:
+        images = convert_from_path(path, dpi=dpi, first_page=first, last_page=last)
+        s.add(pages=len(images))
+    texts = []
+    for img in images:
+        with span("ocr", engine="tesseract") as s:
+            texts.append(pytesseract.image_to_string(preprocess_page(img, max_width), lang=lang))
+            s.add(pages=1, chars=len(texts[-1]))
+    return texts
+
+@register_extractor("pdf_image")
 class PDFLocalImageExtractor(TextExtractor):
     def extract(self, url: str) -> Optional[str]:
-        images = convert_from_path(url)
-        return "".join(pytesseract.image_to_string(img) for img in images)
+        from pdf2image import pdfinfo_from_path
+
+        pages = resolve_page_range(self.config.page_range, pdfinfo_from_path(url)["Pages"])
+        return "".join(self.ocr_pages(url, pages))
+
+    def ocr_pages(self, url: str, pages: range) -> list:
+        """Texte OCR de chaque page de `pages` (indices base 0), dans l'ordre."""
+        cfg = self.config
+        window = max(1, cfg.ocr_window)
+        # Fenêtres de pages : seules `ocr_workers * ocr_window` pages sont en mémoire à la fois
+        windows = [
+            (url, start + 1, min(start + window, pages.stop), cfg.ocr_dpi, cfg.ocr_max_width, cfg.ocr_lang)
+            for start in range(pages.start, pages.stop, window)
+        ]
 
+        if cfg.ocr_workers <= 1:
+            return [text for w in windows for text in _ocr_pdf_window(*w)]
+
+        with span("ocr", engine="tesseract_pool") as s, cf.ProcessPoolExecutor(max_workers=cfg.ocr_workers) as executor:
+            futures = [executor.submit(_ocr_pdf_window, *w) for w in windows]
+            texts = [text for future in futures for text in future.result()]
+            s.add(pages=len(texts), chars=sum(len(t) for t in texts))
+            return texts
+
+@register_extractor("autre")
 class BeautifulSoupExtractor(TextExtractor):
     def extract(self, url: str) -> Optional[str]:
-        soup = BeautifulSoup(requests.get(url).content, "html.parser")
-        return " ".join(p.get_text() for p in soup.find_all("p"))
+        response = self.session.get(url)
+        return html_text_bs4(response.content, html_encoding(response.content, response.headers.get("Content-Type")))
+
+class _LegacyNotebook(Exception):
+    """Notebook antérieur au format 4 (cellules sous `worksheets`)."""
 
+def _notebook_cells_stream(fileobj) -> Iterator[tuple]:
+    """Lecture en flux avec ijson : seuls `cell_type` et `source` sont conservés,
+    les sorties (images base64, logs) sont parcourues sans jamais être assemblées."""
+    import ijson
+
+    cell_type, source = None, []
+    for prefix, event, value in ijson.parse(fileobj):
+        if prefix == "cells.item.cell_type":
+            cell_type = value
+        elif event == "string" and prefix in ("cells.item.source", "cells.item.source.item"):
+            source.append(value)
+        elif prefix == "cells.item" and event == "end_map":
+            yield cell_type, "".join(source)
+            cell_type, source = None, []
+        elif prefix == "worksheets":
+            raise _LegacyNotebook()
+
+def _notebook_cells_nbformat(fileobj) -> Iterator[tuple]:
+    import nbformat
+
+    notebook = nbformat.reads(fileobj.read().decode("utf-8"), as_version=4)
+    for cell in notebook.cells:
+        yield cell.cell_type, cell.source
+
+def notebook_cells(fileobj) -> Iterator[tuple]:
+    """(cell_type, source) de chaque cellule d'un notebook ouvert en binaire.
+
+    Lecture en flux par défaut ; nbformat (lecture complète + conversion) sert de
+    repli pour les anciens formats ou si ijson n'est pas installé.
+    """
+    try:
+        yield from _notebook_cells_stream(fileobj)
+    except (ImportError, _LegacyNotebook):
+        fileobj.seek(0)
+        yield from _notebook_cells_nbformat(fileobj)
+
+def notebook_chunks(cells) -> Iterator[dict]:
+    """Un morceau par cellule markdown ou code, dans l'ordre du notebook."""
+    kept = ((cell_type, source) for cell_type, source in cells if cell_type in ("markdown", "code"))
+    for i, (cell_type, source) in enumerate(kept):
+        yield {"index": i, "text": source, "cell_type": cell_type}
+
+@register_extractor("colab_local")
 class ColabLocalExtractor(TextExtractor):
     def extract(self, url: str) -> Optional[str]:
-        with open(url, "r", encoding="utf-8") as f:
-            notebook = nbformat.read(f, as_version=4)
-        return "\n".join(cell.source for cell in notebook.cells if cell.cell_type in ("markdown", "code"))
+        return "\n".join(chunk["text"] for chunk in self.extract_iter(url))
 
+    def extract_iter(self, url: str) -> Iterator[dict]:
+        with open(url, "rb") as f:
+            yield from notebook_chunks(notebook_cells(f))
+
+@register_extractor("colab_telecharge")
 class ColabTelechargeExtractor(TextExtractor):
     def extract(self, url: str) -> Optional[str]:
-        filename = "temp_notebook.ipynb"
-        with open(filename, "wb") as f:
-            f.write(requests.get(url).content)
-        with open(filename, "r", encoding="utf-8") as f:
-            notebook = nbformat.read(f, as_version=4)
-        os.remove(filename)
-        return "\n".join(cell.source for cell in notebook.cells if cell.cell_type in ("markdown", "code"))
+        return "\n".join(chunk["text"] for chunk in self.extract_iter(url))
+
+    def extract_iter(self, url: str) -> Iterator[dict]:
+        with download(self.session, url, self.config) as buffer:
+            yield from notebook_chunks(notebook_cells(buffer))
+
+def sha256_of(content) -> str:
+    """SHA-256 de bytes ou d'un objet fichier (relu par morceaux puis rembobiné)."""
+    if isinstance(content, bytes):
+        return hashlib.sha256(content).hexdigest()
+    digest = hashlib.sha256()
+    content.seek(0)
+    for block in iter(lambda: content.read(1024 * 1024), b""):
+        digest.update(block)
+    content.seek(0)
+    return digest.hexdigest()
+
+class MistralOCRService:
+    """Client Mistral partagé : résultats OCR mis en cache par contenu, fichiers déjà
+    téléversés réutilisés, et nombre d'appels simultanés borné.
+
+    MISTRAL_SERVER_URL permet de viser un serveur local compatible (tests).
+    """
+
+    def __init__(self, api_key: str, cache_dir: Optional[str], max_inflight: int):
+        from mistralai import Mistral
 
+        server_url = os.getenv("MISTRAL_SERVER_URL")
+        self.client = Mistral(api_key=api_key, server_url=server_url) if server_url else Mistral(api_key=api_key)
+        self.results = DiskCache(Path(cache_dir) / "results", ttl=None) if cache_dir else None
+        self.file_ids = DiskCache(Path(cache_dir) / "files", ttl=None) if cache_dir else None
+        self._inflight = threading.BoundedSemaphore(max(1, max_inflight))
+        self._hash_locks = {}
+        self._lock = threading.Lock()
+
+    def _lock_for(self, digest: str) -> threading.Lock:
+        with self._lock:
+            return self._hash_locks.setdefault(digest, threading.Lock())
+
+    def process(self, file_name: str, content) -> dict:
+        from mistralai import DocumentURLChunk
+
+        digest = sha256_of(content)
+        # Deux workers avec le même PDF : le second attend et relit le cache
+        with self._lock_for(digest):
+            if self.results is not None:
+                cached = self.results.get(digest)
+                instrumentation.count("cache", cache="ocr", result="miss" if cached is None else "hit")
+                if cached is not None:
+                    print(f"♻️ OCR déjà effectué pour ce contenu ({digest[:12]})")
+                    return cached
+
+            with self._inflight:
+                signed_url = self._signed_url(digest, file_name, content)
+                with span("api", api="mistral_ocr") as s:
+                    ocr_result = self.client.ocr.process(
+                        document=DocumentURLChunk(document_url=signed_url),
+                        model="mistral-ocr-latest",
+                    )
+                    data = json.loads(ocr_result.model_dump_json())
+                    s.add(pages=len(data.get("pages", [])),
+                          chars=sum(len(p.get("markdown", "")) for p in data.get("pages", [])))
+            if self.results is not None:
+                self.results.set(digest, data)
+            return data
+
+    def _signed_url(self, digest: str, file_name: str, content) -> str:
+        file_id = self.file_ids.get(digest) if self.file_ids is not None else None
+        if file_id:
+            try:
+                return self.client.files.get_signed_url(file_id=file_id, expiry=1).url
+            except Exception:
+                pass  # fichier expiré ou supprimé côté Mistral : on le renvoie
+
+        with span("api", api="mistral_upload"):
+            uploaded = self.client.files.upload(file={"file_name": file_name, "content": content}, purpose="ocr")
+        if self.file_ids is not None:
+            self.file_ids.set(digest, uploaded.id)
+        return self.client.files.get_signed_url(file_id=uploaded.id, expiry=1).url
+
+_mistral_service: Optional[MistralOCRService] = None
+_mistral_service_lock = threading.Lock()
+
+def mistral_ocr(config: ExtractionConfig, file_name: str, content) -> dict:
+    """Envoie un PDF (bytes ou fichier binaire ouvert) à l'OCR Mistral via le service partagé."""
+    global _mistral_service
+    api_key = os.getenv("MISTRAL_API_KEY")
+    if not api_key:
+        raise ValueError("La clé MISTRAL_API_KEY est manquante.")
+    with _mistral_service_lock:
+        if _mistral_service is None:
+            _mistral_service = MistralOCRService(api_key, config.ocr_cache_dir, config.mistral_inflight)
+    return _mistral_service.process(file_name, content)
+
+@register_extractor("pdf_local_ocr")
 class PDFOcrMistralExtractor(TextExtractor):
-    def __init__(self):
+    def __init__(self, config: Optional[ExtractionConfig] = None, session: Optional[requests.Session] = None):
+        super().__init__(config, session)
         self.api_key = os.getenv("MISTRAL_API_KEY")
 
     def extract(self, url: str) -> Optional[str]:
-        client = Mistral(api_key=self.api_key)
         path = Path(url)
-        uploaded = client.files.upload(file={"file_name": path.name, "content": path.read_bytes()}, purpose="ocr")
-        signed_url = client.files.get_signed_url(file_id=uploaded.id, expiry=1)
-        ocr_result = client.ocr.process(document=DocumentURLChunk(document_url=signed_url.url), model="mistral-ocr-latest")
-        data = json.loads(ocr_result.model_dump_json())
-        fic =  "\n".join(block["text"] for block in data.get("chunks", []))
-        return data
+        with open(path, "rb") as f:  # lu par morceaux (empreinte, envoi), jamais en entier en mémoire
+            return mistral_ocr(self.config, path.name, f)
 
+@register_extractor("pdf_telecharge_ocr")
 class PDFTelechargeOcrMistralExtractor(TextExtractor):
-    def __init__(self):
+    def __init__(self, config: Optional[ExtractionConfig] = None, session: Optional[requests.Session] = None):
+        super().__init__(config, session)
         self.api_key = os.getenv("MISTRAL_API_KEY")
         if not self.api_key:
             raise ValueError("La clé MISTRAL_API_KEY est manquante.")
 
     def extract(self, url: str) -> Optional[str]:
-        filename = "temp_downloaded_ocr.pdf"
-        headers = {"User-Agent": "Mozilla/5.0"}
+        file_name = os.path.basename(urlparse(url).path) or "document.pdf"
 
         try:
             print(f"🔽 Téléchargement de : {url}")
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-
-            with open(filename, "wb") as f:
-                f.write(response.content)
-            print(f"✅ PDF téléchargé : {len(response.content)} octets")
-
-            client = Mistral(api_key=self.api_key)
-            path = Path(filename)
-            uploaded = client.files.upload(
-                file={"file_name": path.name, "content": path.read_bytes()},
-                purpose="ocr",
-            )
-            signed_url = client.files.get_signed_url(file_id=uploaded.id, expiry=1)
-            ocr_result = client.ocr.process(
-                document=DocumentURLChunk(document_url=signed_url.url),
-                model="mistral-ocr-latest",
-            )
-            os.remove(filename)
-
-            data = json.loads(ocr_result.model_dump_json())
-            fic ="\n".join(block["text"] for block in data.get("chunks", []))
-            return data
+            with download(self.session, url, self.config) as buffer:
+                size = buffer.seek(0, os.SEEK_END)
+                buffer.seek(0)
+                print(f"✅ PDF téléchargé : {size} octets")
+                # Le SDK Mistral n'accepte que des bytes ou un fichier ouvert (pas un SpooledTemporaryFile)
+                if size <= self.config.spool_max_bytes:
+                    return mistral_ocr(self.config, file_name, buffer.read())
+                # Gros PDF : recopié dans un fichier nommé et envoyé sans passer par la mémoire
+                with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp:
+                    shutil.copyfileobj(buffer, tmp, self.config.chunk_size)
+                    tmp.flush()
+                    with open(tmp.name, "rb") as f:
+                        return mistral_ocr(self.config, file_name, f)
 
         except requests.HTTPError as e:
             print(f"❌ Erreur HTTP lors du téléchargement : {e}")
         except Exception as e:
             print(f"❌ Erreur inattendue pendant l'extraction OCR : {e}")
-        finally:
-            if os.path.exists(filename):
-                os.remove(filename)
 
         return None
 
+def page_needs_ocr(text: str, min_chars: int) -> bool:
+    """Vrai si la couche texte d'une page est absente, trop courte ou illisible."""
+    stripped = "".join(text.split())
+    if len(stripped) < min_chars:
+        return True
+    # Glyphes non décodés ("(cid:12)", caractère de remplacement) ou symboles en masse
+    if stripped.count("(cid:") * 6 + stripped.count("\ufffd") > len(stripped) * 0.1:
+        return True
+    readable = sum(1 for c in stripped if c.isalnum() or c in ".,;:!?'\"()-%")
+    return readable < len(stripped) * 0.6
+
+@register_extractor("pdf_hybride")
+class PDFHybridExtractor(TextExtractor):
+    """Utilise la couche texte quand elle existe et n'envoie à l'OCR que les autres pages."""
+
+    def extract(self, url: str) -> Optional[dict]:
+        from PyPDF2 import PdfReader
+
+        if url.startswith("http"):
+            with download(self.session, url, self.config) as buffer:
+                return self._extract_reader(url, PdfReader(buffer))
+        return self._extract_reader(url, PdfReader(url))
+
+    def _extract_reader(self, url: str, reader: "PdfReader") -> dict:
+        from PyPDF2 import PdfWriter
+
+        cfg = self.config
+        pages = resolve_page_range(cfg.page_range, len(reader.pages))
+        texts = {i: reader.pages[i].extract_text() or "" for i in pages}
+        to_ocr = [i for i in pages if page_needs_ocr(texts[i], cfg.hybrid_min_chars)]
+
+        if to_ocr:
+            # Sous-document ne contenant que les pages à OCRiser
+            writer = PdfWriter()
+            for i in to_ocr:
+                writer.add_page(reader.pages[i])
+            sub_pdf = io.BytesIO()
+            writer.write(sub_pdf)
+            for i, text in zip(to_ocr, self._ocr(sub_pdf.getvalue(), len(to_ocr))):
+                texts[i] = text
+
+        print(f"📊 Hybride : {len(pages) - len(to_ocr)} page(s) texte, {len(to_ocr)} page(s) OCR ({cfg.hybrid_engine})")
+        title = os.path.basename(urlparse(url).path) or "document"
+        ocr_set = set(to_ocr)
+        return {
+            "title": title,
+            "text": "\n\n".join(texts[i] for i in pages),
+            "pages": [
+                {"index": i, "markdown": texts[i], "method": "ocr" if i in ocr_set else "texte"}
+                for i in pages
+            ],
+            "stats": {"pages_texte": len(pages) - len(to_ocr), "pages_ocr": len(to_ocr)},
+        }
+
+    def _ocr(self, pdf_bytes: bytes, page_count: int) -> list:
+        if self.config.hybrid_engine == "tesseract":
+            with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp:
+                tmp.write(pdf_bytes)
+                tmp.flush()
+                return PDFLocalImageExtractor(self.config, self.session).ocr_pages(tmp.name, range(page_count))
+
+        data = mistral_ocr(self.config, "pages_hybride.pdf", pdf_bytes)
+        by_index = {p.get("index", n): p.get("markdown", "") for n, p in enumerate(data.get("pages", []))}
+        return [by_index.get(n, "") for n in range(page_count)]
+
 # === Dispatcher et extraction
-def detect_source(url: str, ocr: bool) -> str:
+def detect_source(url: str, ocr: bool, hybrid: bool = False) -> str:
+    source = plugin_source(url)
+    if source is not None:
+        return source
     if "youtube.com" in url or "youtu.be" in url:
         return "youtube"
+    if url.endswith(".pdf") and hybrid:
+        return "pdf_hybride"
     if url.endswith(".pdf") and url.startswith("http"):
         return "pdf_telecharge_ocr" if ocr else "pdf_telecharge"
     if url.endswith(".pdf"):
@@ -181,40 +894,130 @@ def detect_source(url: str, ocr: bool) -> str:
         return "trafilatura"
     return "autre"
 
-def get_extractor(source: str):
-    sources_extracteurs = {
-        "youtube": VideoExtractor,
-        "trafilatura": BeautifulSoupExtractor,
-        "pdf_telecharge": PDFTelechargeExtractor,
-        "pdf_local": PDFLocalExtractor,
-        "pdf_telecharge_ocr": PDFTelechargeOcrMistralExtractor,
-        "pdf_local_ocr": PDFOcrMistralExtractor,
-        "autre": BeautifulSoupExtractor,
-        "colab_local": ColabLocalExtractor,
-        "colab_telecharge": ColabTelechargeExtractor,
-        "pdf_image": PDFLocalImageExtractor,
-    }
-    extractor_class = sources_extracteurs.get(source)
+def get_extractor(source: str, config: Optional[ExtractionConfig] = None, session: Optional[requests.Session] = None):
+    if source not in EXTRACTORS:
+        load_plugins()
+    extractor_class = EXTRACTORS.get(source)
     if extractor_class is None:
         raise ValueError(f"Source non supportée : {source}")
-    return extractor_class()
-
-def extrait(url: str, ocr: bool = False) -> Optional[dict]:
-    source = detect_source(url, ocr)
-    extractor = get_extractor(source)
-    result = extractor.extract(url)
-   
-    # Si l'extracteur retourne un texte brut, on l'encapsule dans un dict
-    if isinstance(result, str):
-        parsed_url = urlparse(url)
-        raw_title = os.path.basename(parsed_url.path) or "document"
-        return {
-            "title": raw_title,
-            "text": result
-        }
-    # Sinon on retourne directement (si déjà un dict)
- 
-    return result
+    return extractor_class(config=config, session=session)
+
+# === Cache d'extraction
+CACHE_DIR = Path(".cache/extraction")
+OCR_CACHE_DIR = ".cache/ocr"
+YOUTUBE_CACHE_DIR = ".cache/youtube"
+CACHE_FORMAT = "chunks-v1"  # à changer si le format des entrées en cache évolue
+MANIFEST_PATH = "output/manifest.sqlite"
+DUPLICATES_REPORT = "output/doublons.json"
+
+def normalize_url(url: str) -> str:
+    """Forme canonique d'une URL (ou chemin absolu) utilisée comme clé de cache."""
+    url = url.strip()
+    if not re.match(r"https?://", url):
+        return os.path.abspath(url)
+    parsed = urlparse(url)
+    scheme = parsed.scheme.lower()
+    netloc = parsed.netloc.lower()
+    if (scheme, netloc.rsplit(":", 1)[-1]) in (("http", "80"), ("https", "443")):
+        netloc = netloc.rsplit(":", 1)[0]
+    query = urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+    return urlunparse((scheme, netloc, parsed.path or "/", parsed.params, query, ""))
+
+def revalidate(url: str, source: str, session: requests.Session, cached: Optional[dict]) -> tuple:
+    """Vérifie si la ressource a changé depuis la mise en cache.
+
+    Retourne (inchangée, validateurs) où les validateurs sont ETag/Last-Modified
+    pour une URL, ou mtime/taille pour un fichier local.
+    """
+    if source == "youtube":
+        # Pas de validateur exploitable : seule l'expiration (TTL) s'applique
+        return cached is not None, {}
+
+    if not url.startswith("http"):
+        st = os.stat(url)
+        validators = {"mtime_ns": st.st_mtime_ns, "size": st.st_size}
+        return cached == validators, validators
+
+    if not cached:
+        # Rien à comparer : pas de HEAD, les validateurs viendront du GET (voir _record_validators)
+        return False, {}
+    headers = {}
+    if cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    if cached.get("last_modified"):
+        headers["If-Modified-Since"] = cached["last_modified"]
+    try:
+        response = session.head(url, headers=headers, allow_redirects=True)
+    except requests.RequestException:
+        return False, {}
+    if response.status_code == 304:
+        return True, cached
+
+    validators = http_validators(response.headers)
+    # Certains serveurs ignorent les en-têtes conditionnels sur HEAD
+    return cached == validators, validators
+
+def _cache_while_streaming(chunks: Iterator[dict], cache: DiskCache, key: str, title: str,
+                           validators: dict, max_chars: int) -> Iterator[dict]:
+    """Relaie les morceaux et les garde pour le cache, sauf si le document dépasse `max_chars`.
+
+    Sans validateurs (première extraction), ceux du téléchargement sont relevés au passage.
+    """
+    kept, size = [], 0
+    _fetch_validators.current = validators
+    try:
+        for chunk in chunks:
+            if kept is not None:
+                size += len(chunk.get("text") or "")
+                if size > max_chars:
+                    kept = None
+                else:
+                    kept.append(chunk)
+            yield chunk
+    finally:
+        _fetch_validators.current = None
+    if kept:
+        cache.set(key, {"title": title, "chunks": kept}, validators)
+
+def extrait_iter(url: str, ocr: bool = False, config: Optional[ExtractionConfig] = None,
+                 session: Optional[requests.Session] = None, cache: Optional[DiskCache] = None) -> tuple:
+    """Comme `extrait`, mais retourne (titre, générateur de morceaux) pour écrire au fil de l'eau."""
+    config = config or ExtractionConfig()
+    source = detect_source(url, ocr, hybrid=config.hybrid)
+
+    key, validators = None, {}
+    if cache is not None:
+        variant = None  # réglages qui changent le résultat pour ce type de source
+        if source == "pdf_hybride":
+            variant = (config.hybrid_engine, config.hybrid_min_chars)
+        elif source == "youtube":
+            variant = config.youtube_languages
+        elif source == "trafilatura":
+            variant = (config.html_engines, config.html_min_chars)
+        key = cache_key(normalize_url(url), source, ocr, config.page_range, variant, CACHE_FORMAT)
+        entry = cache.get_entry(key)
+        with span("revalidate", extractor=source):
+            unchanged, validators = revalidate(url, source, session or get_session(), entry["meta"] if entry else None)
+        instrumentation.count("cache", cache="extraction", result="hit" if entry and unchanged else "miss")
+        if entry and unchanged:
+            print(f"♻️ Cache : {url} inchangé, extraction ignorée")
+            # Pas de réécriture : stored_at reste celui de l'extraction et le TTL s'applique
+            return entry["value"]["title"], iter(entry["value"]["chunks"])
+
+    extractor = get_extractor(source, config=config, session=session)
+    title = extractor.title(url) or os.path.basename(urlparse(url).path) or "document"
+    chunks = extractor.extract_iter(url)
+    if key is not None:
+        chunks = _cache_while_streaming(chunks, cache, key, title, validators, config.cache_max_entry_chars)
+    return title, chunks
+
+def extrait(url: str, ocr: bool = False, config: Optional[ExtractionConfig] = None,
+            session: Optional[requests.Session] = None, cache: Optional[DiskCache] = None) -> Optional[dict]:
+    title, chunks = extrait_iter(url, ocr=ocr, config=config, session=session, cache=cache)
+    texts = [chunk["text"] for chunk in chunks]
+    if not texts:
+        return None
+    return {"title": title, "text": "\n".join(texts)}
 
 def format_markdown(text: str) -> str:
     lines = text.splitlines()
@@ -242,97 +1045,420 @@ def sanitize_filename(name: str) -> str:
     """Nettoie une chaîne pour en faire un nom de fichier sûr."""
     return re.sub(r'\W+', '_', name).strip('_') or "document"
 
-def process_urls(urls: list, ocr: bool):
+# Lu une fois à l'import (os.umask est global au processus et n'a pas de lecture seule)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+def _publish(tmp_path: str, target: Path):
+    """Renomme `tmp_path` en `target` avec les droits d'un fichier créé normalement
+    (mkstemp crée en 0600) ou ceux du fichier remplacé."""
+    try:
+        mode = target.stat().st_mode & 0o777
+    except FileNotFoundError:
+        mode = 0o666 & ~_UMASK
+    os.chmod(tmp_path, mode)
+    os.replace(tmp_path, target)
+
+class StreamingOutput:
+    """Écrit le Markdown et le JSON d'un document morceau par morceau.
+
+    Les fichiers sont d'abord écrits sous un nom temporaire unique dans output/,
+    puis renommés d'après le titre par `finalize` : plusieurs workers peuvent
+    écrire en parallèle sans se gêner.
+    """
+
+    def __init__(self, output_dir: str = "output", fmt: str = "json", document: Optional[dict] = None,
+                 fingerprint: bool = False):
+        self.output_dir = Path(output_dir)
+        self.fmt = fmt
+        fd_md, self.md_tmp = tempfile.mkstemp(dir=output_dir, prefix=".", suffix=".md.part")
+        fd_json, self.json_tmp = tempfile.mkstemp(dir=output_dir, prefix=".", suffix=FORMATS[fmt] + ".part")
+        self._md = os.fdopen(fd_md, "w", encoding="utf-8")
+        self._pages = PagesWriter(os.fdopen(fd_json, "wb"), fmt, document)
+        self._hash = hashlib.sha256()
+        self._simhash = SimHasher() if fingerprint else None
+        self.count = 0
+        self.chars = 0
+        self.tokens = 0
+
+    def write(self, chunk: dict):
+        markdown_text = format_markdown(chunk.get("text") or "")
+        if not markdown_text:
+            return
+        self._md.write(markdown_text)
+
+        # Format synthèse : une entrée par page/segment, avec sa position dans le
+        # Markdown et sa taille, pour pouvoir découper la synthèse sans tout relire
+        page = {
+            "index": chunk.get("index", self.count),
+            "markdown": markdown_text,
+            "offset": self.chars,
+            "chars": len(markdown_text),
+            "tokens": estimate_tokens(markdown_text),
+        }
+        page.update((k, v) for k, v in chunk.items() if k not in ("index", "text"))
+        self._pages.write_page(page)
+
+        self._hash.update(markdown_text.encode("utf-8"))
+        if self._simhash is not None:
+            self._simhash.update(markdown_text)
+        self.count += 1
+        self.chars += len(markdown_text)
+        self.tokens += page["tokens"]
+
+    def close(self):
+        self._md.close()
+        self._pages.close()
+
+    def fingerprint(self) -> tuple:
+        """(SHA-256, SimHash) du Markdown écrit ; le SimHash vaut None s'il n'est pas
+        calculé ou si le texte est trop court pour qu'il soit fiable."""
+        simhash = None
+        if self._simhash is not None and self._simhash.words >= MIN_WORDS:
+            simhash = self._simhash.digest()
+        return self._hash.hexdigest(), simhash
+
+    def discard(self):
+        self.close()
+        for path in (self.md_tmp, self.json_tmp):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def finalize(self, title: str) -> dict:
+        """Renomme les fichiers d'après le titre et retourne leurs chemins et l'empreinte du contenu."""
+        self.close()
+        safe_title = sanitize_filename(title)
+        output_md_path = self.output_dir / f"{safe_title}.md"
+        output_json_path = self.output_dir / f"{safe_title}{FORMATS[self.fmt]}"
+        _publish(self.md_tmp, output_md_path)
+        _publish(self.json_tmp, output_json_path)
+        print(f"✅ Markdown : {output_md_path}")
+        print(f"✅ JSON : {output_json_path}")
+        return {
+            "md_path": str(output_md_path),
+            "json_path": str(output_json_path),
+            "chars": self.chars,
+            "content_hash": self._hash.hexdigest(),
+            "simhash": self.fingerprint()[1],
+        }
+
+class HostLimiter:
+    """Limite le nombre de requêtes simultanées vers un même hôte."""
+
+    def __init__(self, per_host: int):
+        self.per_host = max(1, per_host)
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def acquire_for(self, url: str) -> threading.BoundedSemaphore:
+        host = urlparse(url).netloc.lower() or "local"
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.per_host)
+            return self._semaphores[host]
+
+def read_url_list(path: str) -> list:
+    """Lit une liste d'URLs depuis un fichier XLSX, CSV ou TXT, sans doublons et dans l'ordre.
+
+    Pour XLSX/CSV, la colonne "URL" est utilisée si elle existe, sinon la première.
+    Pour TXT, une URL par ligne ; les lignes vides et les commentaires (#) sont ignorés.
+    """
+    suffix = Path(path).suffix.lower()
+    if suffix == ".xlsx":
+        import pandas as pd
+
+        df = pd.read_excel(path)
+        column = df["URL"] if "URL" in df.columns else df.iloc[:, 0]
+        raw = column.dropna().astype(str).tolist()
+    elif suffix == ".csv":
+        import csv
+
+        with open(path, newline="", encoding="utf-8-sig") as f:  # BOM des exports Excel
+            rows = list(csv.reader(f))
+        if not rows:
+            return []
+        header = [h.strip() for h in rows[0]]
+        if "URL" in header:
+            col = header.index("URL")
+            rows = rows[1:]
+        else:
+            col = 0
+        raw = [row[col] for row in rows if len(row) > col]
+    else:
+        with open(path, encoding="utf-8") as f:
+            raw = [line for line in f if not line.lstrip().startswith("#")]
+
+    urls = (u.strip() for u in raw)
+    return list(dict.fromkeys(u for u in urls if u))
+
+@dataclass
+class BatchStats:
+    total: int = 0
+    ok: int = 0
+    failed: int = 0
+    skipped: int = 0
+    already_done: int = 0
+    chars: int = 0
+    elapsed: float = 0.0
+    duplicates: list = field(default_factory=list)  # {"url", "doublon_de", "raison", "distance"}
+
+    def print_summary(self):
+        rate = self.ok / self.elapsed if self.elapsed else 0.0
+        char_rate = self.chars / self.elapsed if self.elapsed else 0.0
+        print("\n📊 Bilan de l'extraction")
+        print(f"   URLs reçues      : {self.total}")
+        print(f"   ✅ Réussies      : {self.ok}")
+        print(f"   ❌ Échecs        : {self.failed}")
+        print(f"   ⏭️  Ignorées      : {self.skipped}")
+        print(f"   ♻️  Déjà faites   : {self.already_done}")
+        print(f"   🔁 Doublons      : {len(self.duplicates)}")
+        for dup in self.duplicates:
+            print(f"      {dup['url']} → {dup['doublon_de']} ({dup['raison']})")
+        print(f"   ⏱️  Durée         : {self.elapsed:.1f} s")
+        print(f"   🚀 Débit         : {rate:.2f} URL/s, {char_rate:,.0f} caractères/s")
+
+def process_urls(urls: list, ocr: bool, workers: int = 1, per_host: int = 2,
+                 config: Optional[ExtractionConfig] = None, cache: Optional[DiskCache] = None,
+                 manifest: Optional[BatchManifest] = None, mode: str = RESUME,
+                 output_format: str = "json", dedup: bool = True, dedup_distance: int = 3) -> BatchStats:
+    started = time.perf_counter()
+    stats = BatchStats(total=len(urls))
+    config = config or ExtractionConfig()
+    # Une seule session pour tout le lot : les connexions vers un même hôte sont réutilisées
+    session = build_session(replace(config, pool_size=max(config.pool_size, workers)))
     processed_urls = set()  # Utiliser un ensemble pour suivre les URLs traitées
+    canonical_urls = {}     # URL canonique -> première URL du lot qui la désigne
+    pending = []
+
+    def _duplicate(url: str, original: str, reason: str, distance: int = 0, duration: float = 0.0,
+                   content_hash: Optional[str] = None):
+        print(f"🔁 {url} : doublon de {original} ({reason})")
+        stats.duplicates.append({"url": url, "doublon_de": original, "raison": reason, "distance": distance})
+        if manifest is not None:
+            manifest.mark_duplicate(url, original, duration, content_hash)
 
     for url in urls:
-        # Vérifie si l'URL est valide
-        if not re.match(r'https?://', url):
+        # Vérifie si l'URL est valide (ou désigne un fichier local : PDF, notebook)
+        if not re.match(r'https?://', url) and not os.path.isfile(url):
             print(f"URL invalide ignorée : {url}")
+            stats.skipped += 1
             continue
 
         # Vérifie si l'URL a déjà été traitée
         if url in processed_urls:
             print(f"URL déjà traitée : {url}")
+            stats.skipped += 1
             continue
 
         processed_urls.add(url)  # Ajoute l'URL à l'ensemble des URLs traitées
 
-        print(f"\n🔄 Extraction OCR ou texte à partir de {url}...")
-        result = extrait(str(url), ocr=ocr)
+        # Même page sous une autre URL (paramètres de suivi, AMP, www.) : pas d'extraction
+        if dedup:
+            canonical = canonical_url(url)
+            if canonical in canonical_urls:
+                _duplicate(url, canonical_urls[canonical], "url")
+                continue
+            canonical_urls[canonical] = url
 
-        if not result:
-            print("❌ Aucun résultat.")
-            continue
+        if manifest is not None:
+            todo, reason = manifest.should_process(url, mode)
+            if not todo:
+                print(f"⏭️ {url} : {reason}")
+                stats.already_done += 1
+                continue
+            manifest.mark_pending(url)
+        pending.append(url)
 
-        # Récupération du texte extrait
-        text = result.get("text")
+    limiter = HostLimiter(per_host)
 
-        # Cas OCR : extraire depuis pages[]
-        if not text and "pages" in result:
-            text = "\n\n".join(p.get("markdown", "") for p in result["pages"])
+    # Empreintes des documents déjà retenus, y compris ceux des lots précédents
+    index = DuplicateIndex(dedup_distance) if dedup else None
+    if index is not None and manifest is not None:
+        pending_set = set(pending)
+        for done_url, content_hash, simhash in manifest.fingerprints():
+            if done_url not in pending_set:
+                index.add(done_url, content_hash, simhash)
 
-        if not text or not text.strip():
-            print("❌ Aucune donnée extraite.")
-            continue
-
-        # Déterminer le titre
-        raw_title = result.get("title")
-        if not raw_title:
-            parsed_url = urlparse(url)
-            raw_title = os.path.basename(parsed_url.path)
-
-        # Nettoyage du titre pour nom de fichier
-        safe_title = re.sub(r'\W+', '_', raw_title).strip('_')
+    # Vidéos YouTube : titres et transcriptions partent tout de suite en parallèle
+    # (plafond `youtube_inflight`), sans attendre qu'un worker arrive à chaque URL
+    video_ids = [extract_video_id(url) for url in pending if detect_source(url, ocr, config.hybrid) == "youtube"]
+    if any(video_ids):
+        youtube_service(config).prefetch([v for v in video_ids if v], session)
 
-        # Chemins de sortie
-        output_md_path = Path(f"output/{safe_title}.md")
-        output_json_path = Path(f"output/{safe_title}.json")
+    def _extract(url: str) -> tuple:
+        with limiter.acquire_for(url):
+            print(f"\n🔄 Extraction OCR ou texte à partir de {url}...")
+            t0 = time.perf_counter()
+            try:
+                with span("extract", extractor=detect_source(url, ocr, config.hybrid)) as s:
+                    title, chunks = extrait_iter(str(url), ocr=ocr, config=config, session=session, cache=cache)
+                    # Le texte part sur disque au fur et à mesure : jamais de copie complète en mémoire
+                    output = StreamingOutput(fmt=output_format, document={"title": title, "url": url}, fingerprint=dedup)
+                    try:
+                        for chunk in chunks:
+                            output.write(chunk)
+                        output.close()
+                    except BaseException:
+                        output.discard()
+                        raise
+                    s.add(chunks=output.count, chars=output.chars, tokens=output.tokens)
+                return title, output, time.perf_counter() - t0, None
+            except Exception as e:
+                return None, None, time.perf_counter() - t0, e
 
-        # Sauvegarde Markdown
-        markdown_text = format_markdown(text)
-        with open(output_md_path, "w", encoding="utf-8") as f:
-            f.write(markdown_text)
-        print(f"✅ Markdown : {output_md_path}")
+    # Les extractions tournent en parallèle, mais les sorties sont renommées
+    # dans l'ordre d'entrée pour que le contenu de output/ reste déterministe.
+    with cf.ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [(url, executor.submit(_extract, url)) for url in pending]
+        for url, future in futures:
+            title, output, duration, error = future.result()
+            if error is not None:
+                print(f"❌ Erreur pendant l'extraction de {url} : {error}")
+                stats.failed += 1
+                if manifest is not None:
+                    manifest.mark_failed(url, f"{type(error).__name__}: {error}", duration)
+                continue
+            saved = None
+            if output.count and index is not None:
+                content_hash, simhash = output.fingerprint()
+                match = index.find(content_hash, simhash)
+                if match is not None:
+                    # Même contenu qu'un document déjà retenu : aucun fichier, donc ni synthèse ni podcast
+                    output.discard()
+                    original, reason, distance = match
+                    _duplicate(url, original, reason, distance, duration, content_hash)
+                    continue
+            if output.count:
+                saved = output.finalize(title)
+                if index is not None:
+                    index.add(url, saved["content_hash"], saved["simhash"])
+            else:
+                output.discard()
+                print("❌ Aucune donnée extraite.")
+            if saved:
+                stats.ok += 1
+                stats.chars += saved["chars"]
+                if manifest is not None:
+                    manifest.mark_done(url, saved["md_path"], saved["json_path"], saved["content_hash"], duration,
+                                       saved["simhash"])
+            else:
+                stats.failed += 1
+                if manifest is not None:
+                    manifest.mark_failed(url, "Aucune donnée extraite", duration)
 
-        # Sauvegarde JSON format synthèse
-        pages_json = {
-            "pages": [
-                {
-                    "index": 0,
-                    "markdown": markdown_text
-                }
-            ]
-        }
-        with open(output_json_path, "w", encoding="utf-8") as jf:
-            json.dump(pages_json, jf, ensure_ascii=False, indent=2)
-        print(f"✅ JSON : {output_json_path}")
+    stats.elapsed = time.perf_counter() - started
+    if dedup:
+        Path(DUPLICATES_REPORT).write_text(json.dumps(stats.duplicates, ensure_ascii=False, indent=2), encoding="utf-8")
+    stats.print_summary()
+    return stats
 
 
 
 def main():
     parser = argparse.ArgumentParser(description="Extracteur universel 🧠")
-    parser.add_argument("input", help="URL ou chemin du fichier XLSX contenant les URLs")
+    parser.add_argument("input", nargs="?", help="URL, ou fichier XLSX/CSV/TXT contenant les URLs")
     parser.add_argument("--ocr", action="store_true", help="Activer OCR")
+    parser.add_argument("--workers", type=int, default=1, help="Nombre d'extractions simultanées")
+    parser.add_argument("--per-host", type=int, default=2, help="Extractions simultanées maximum par hôte")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Timeout HTTP en secondes")
+    parser.add_argument("--retries", type=int, default=3, help="Nombre de tentatives HTTP en cas d'erreur")
+    parser.add_argument("--pdf-workers", type=int, default=1, help="Processus pour l'extraction des pages d'un PDF local")
+    parser.add_argument("--pdf-chunk-size", type=int, default=50, help="Nombre de pages par tâche d'extraction")
+    parser.add_argument("--pages", type=parse_page_range, help="Pages à extraire, ex. 10-50")
+    parser.add_argument("--ocr-workers", type=int, default=1, help="Processus Tesseract pour l'OCR local")
+    parser.add_argument("--ocr-dpi", type=int, default=200, help="Résolution de rastérisation pour l'OCR local")
+    parser.add_argument("--hybrid", action="store_true", help="PDF : OCR uniquement des pages sans couche texte")
+    parser.add_argument("--hybrid-min-chars", type=int, default=100, help="Caractères par page en dessous desquels la page part à l'OCR")
+    parser.add_argument("--hybrid-engine", choices=["mistral", "tesseract"], default="mistral", help="Moteur OCR du mode hybride")
+    parser.add_argument("--html-engines", type=lambda v: tuple(e.strip() for e in v.split(",")),
+                        default=("trafilatura", "lxml", "bs4"), help="Ordre des moteurs HTML, ex. lxml,bs4")
+    parser.add_argument("--mistral-inflight", type=int, default=4, help="Appels OCR Mistral simultanés maximum")
+    parser.add_argument("--youtube-inflight", type=int, default=8, help="Requêtes YouTube simultanées maximum")
+    parser.add_argument("--youtube-langs", type=lambda v: tuple(l.strip() for l in v.split(",")),
+                        default=("fr", "en"), help="Langues de transcription par ordre de préférence, ex. fr,en")
+    parser.add_argument("--manifest", default=MANIFEST_PATH, help="Manifeste SQLite du lot (reprise après interruption)")
+    parser.add_argument("--no-manifest", action="store_true", help="Ne pas suivre le lot dans un manifeste")
+    reprise = parser.add_mutually_exclusive_group()
+    reprise.add_argument("--resume", dest="mode", action="store_const", const=RESUME,
+                         help="Reprendre le lot : ignorer les URLs terminées, retenter les échecs après backoff "
+                              "(défaut pour une liste d'URLs)")
+    reprise.add_argument("--retry-failed", dest="mode", action="store_const", const=RETRY_FAILED,
+                         help="Retenter immédiatement toutes les URLs en échec")
+    reprise.add_argument("--force", dest="mode", action="store_const", const=FORCE,
+                         help="Retraiter toutes les URLs, même terminées")
+    parser.set_defaults(mode=None)  # None : manifeste seulement pour une liste d'URLs
+    parser.add_argument("--output-format", choices=list(FORMATS), default="json",
+                        help="Format des pages extraites : json (compatible synthèse), jsonl ou jsonl.zst")
+    parser.add_argument("--no-dedup", action="store_true", help="Ne pas écarter les doublons (URL canonique, contenu)")
+    parser.add_argument("--dedup-distance", type=int, default=3,
+                        help="Écart SimHash maximal (en bits) entre deux contenus considérés comme identiques")
+    parser.add_argument("--no-cache", action="store_true", help="Ignorer le cache d'extraction")
+    parser.add_argument("--purge-cache", action="store_true", help="Vider le cache d'extraction avant de commencer")
+    parser.add_argument("--cache-ttl", type=float, default=168, help="Durée de validité du cache en heures")
+    parser.add_argument("--cache-max-mb", type=int, default=500, help="Taille maximale du cache en Mo")
+    instrumentation.add_arguments(parser)
+    profiling.add_arguments(parser)
     args = parser.parse_args()
+    with profiling.maybe_profile("extraction", profiling.mode_from_args(args)):
+        run(args, parser)
 
+def run(args: argparse.Namespace, parser: argparse.ArgumentParser):
     os.makedirs("output", exist_ok=True)
+    config = ExtractionConfig(
+        timeout=args.timeout,
+        retries=args.retries,
+        pdf_workers=args.pdf_workers,
+        pdf_chunk_size=args.pdf_chunk_size,
+        page_range=args.pages,
+        ocr_workers=args.ocr_workers,
+        ocr_dpi=args.ocr_dpi,
+        hybrid=args.hybrid,
+        hybrid_min_chars=args.hybrid_min_chars,
+        hybrid_engine=args.hybrid_engine,
+        mistral_inflight=args.mistral_inflight,
+        html_engines=args.html_engines,
+        ocr_cache_dir=None if args.no_cache else OCR_CACHE_DIR,
+        youtube_inflight=args.youtube_inflight,
+        youtube_languages=args.youtube_langs,
+        youtube_cache_dir=None if args.no_cache else YOUTUBE_CACHE_DIR,
+    )
+
+    cache = None
+    if not args.no_cache or args.purge_cache:
+        cache = DiskCache(CACHE_DIR, ttl=args.cache_ttl * 3600, max_bytes=args.cache_max_mb * 1024 * 1024)
+    if args.purge_cache:
+        cache.purge()
+        shutil.rmtree(OCR_CACHE_DIR, ignore_errors=True)
+        shutil.rmtree(YOUTUBE_CACHE_DIR, ignore_errors=True)
+        print(f"🧹 Cache vidé : {CACHE_DIR}, {OCR_CACHE_DIR}, {YOUTUBE_CACHE_DIR}")
+    if args.no_cache:
+        cache = None
+
+    if not args.input:
+        if not args.purge_cache:
+            parser.error("l'argument input est requis")
+        return
 
     input_path = args.input
-    if input_path.endswith(".xlsx"):
-        # Lire les URLs depuis le fichier XLSX
-        df = pd.read_excel(input_path)
-        #urls = df.iloc[:, 0].astype(str).tolist()  # Convertir les Timestamp en chaînes de caractères
-        # Vérifier si la colonne "URL" existe dans le DataFrame
-        if "URL" in df.columns:
-            urls = df["URL"].astype(str).tolist()  # Convertir les URLs en chaînes de caractères
-            process_urls(urls, args.ocr)
-        else:
-            print("La colonne 'URL' n'existe pas dans le fichier Excel.")
-        process_urls(urls, args.ocr)
+    batch = Path(input_path).suffix.lower() in (".xlsx", ".csv", ".txt") and os.path.isfile(input_path)
+    if batch:
+        # Lot d'URLs : lecture et déduplication une seule fois, puis tout dans ce processus
+        urls = read_url_list(input_path)
+        print(f"📋 {len(urls)} URL(s) unique(s) lue(s) depuis {input_path}")
     else:
         # Traiter une seule URL
-        process_urls([input_path], args.ocr)
+        urls = [input_path]
+    # Une URL seule est réextraite à chaque appel, sauf option de reprise explicite
+    use_manifest = (batch or args.mode is not None) and not args.no_manifest
+    manifest = BatchManifest(args.manifest) if use_manifest else None
+    try:
+        process_urls(urls, args.ocr, workers=args.workers, per_host=args.per_host, config=config, cache=cache,
+                     manifest=manifest, mode=args.mode or RESUME, output_format=args.output_format,
+                     dedup=not args.no_dedup, dedup_distance=args.dedup_distance)
+    finally:
+        if manifest is not None:
+            manifest.close()
+        instrumentation.report("extraction", args.metrics)
 
 if __name__ == "__main__":
     #input_path="https://levelup.gitconnected.com/the-guide-to-mcp-i-never-had-f79091cf99f8?gi=743c7d82d5cd"
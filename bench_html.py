@@ -0,0 +1,75 @@
+# bench_html.py
+# Compare les moteurs d'extraction HTML d'Extraction.py sur un corpus de pages sauvegardées.
+import argparse
+import time
+import tracemalloc
+from pathlib import Path
+
+from Extraction import HTML_ENGINES, html_encoding
+
+# Pages dont le texte attendu dépend de l'encodage : (nom, contenu, en-tête Content-Type, texte attendu)
+ENCODING_CASES = [
+    ("utf-8 sans meta", b"<html><body><p>\xc3\xa9t\xc3\xa9</p></body></html>", None, "été"),
+    ("charset HTTP", b"<html><body><p>\xe9t\xe9</p></body></html>", "text/html; charset=ISO-8859-1", "été"),
+]
+
+
+def check_encoding(name: str) -> list:
+    """Cas d'encodage mal décodés par le moteur."""
+    extract = HTML_ENGINES[name]
+    return [case for case, content, content_type, expected in ENCODING_CASES
+            if extract(content, html_encoding(content, content_type)).strip() != expected]
+
+
+def bench_engine(name: str, pages: list, repeat: int) -> dict:
+    extract = HTML_ENGINES[name]
+    pages = [(content, html_encoding(content)) for _, content in pages]
+    extract(*pages[0])  # chauffe : imports paresseux hors mesure
+
+    durations = []
+    peaks = []
+    chars = 0
+    for _ in range(repeat):
+        for content, encoding in pages:
+            tracemalloc.start()
+            t0 = time.perf_counter()
+            text = extract(content, encoding)
+            durations.append(time.perf_counter() - t0)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            chars += len(text)
+
+    durations.sort()
+    return {
+        "engine": name,
+        "mean_ms": 1000 * sum(durations) / len(durations),
+        "p95_ms": 1000 * durations[int(0.95 * (len(durations) - 1))],
+        "peak_kb": max(peaks) / 1024,
+        "chars": chars // repeat,
+        "encoding": ", ".join(check_encoding(name)) or "ok",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des moteurs HTML (temps et mémoire par page)")
+    parser.add_argument("corpus", help="Dossier contenant des pages .html sauvegardées")
+    parser.add_argument("--engines", default=",".join(HTML_ENGINES), help="Moteurs à comparer, séparés par des virgules")
+    parser.add_argument("--repeat", type=int, default=3, help="Nombre de passes sur le corpus")
+    args = parser.parse_args()
+
+    files = sorted(p for p in Path(args.corpus).rglob("*") if p.suffix.lower() in (".html", ".htm"))
+    if not files:
+        print(f"❌ Aucune page .html dans {args.corpus}")
+        return
+    pages = [(p.name, p.read_bytes()) for p in files]
+    total_kb = sum(len(c) for _, c in pages) / 1024
+    print(f"📚 {len(pages)} page(s), {total_kb:.0f} Ko de HTML, {args.repeat} passe(s)\n")
+
+    print(f"{'moteur':<12} {'moy. ms':>9} {'p95 ms':>9} {'pic Ko':>9} {'caractères':>11}  encodage")
+    for name in args.engines.split(","):
+        r = bench_engine(name.strip(), pages, args.repeat)
+        print(f"{r['engine']:<12} {r['mean_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['peak_kb']:>9.0f} {r['chars']:>11}  {r['encoding']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# bench_notebook.py
+# Compare la lecture complète nbformat et la lecture en flux (ijson) des notebooks d'Extraction.py.
+import argparse
+import base64
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from Extraction import _notebook_cells_nbformat, _notebook_cells_stream, notebook_chunks
+
+READERS = {"nbformat": _notebook_cells_nbformat, "flux": _notebook_cells_stream}
+
+
+def make_notebook(path: Path, cells: int, output_kb: int):
+    """Notebook synthétique : chaque cellule de code porte une image PNG factice de `output_kb` Ko."""
+    image = base64.b64encode(os.urandom(output_kb * 768)).decode("ascii")
+    notebook = {"cells": [], "metadata": {}, "nbformat": 4, "nbformat_minor": 5}
+    for i in range(cells):
+        notebook["cells"].append({"cell_type": "markdown", "id": f"m{i}", "metadata": {}, "source": [f"## Section {i}\n", "Texte explicatif."]})
+        notebook["cells"].append({
+            "cell_type": "code", "id": f"c{i}", "execution_count": i, "metadata": {},
+            "source": [f"plot(data[{i}])"],
+            "outputs": [{"output_type": "display_data", "metadata": {}, "data": {"image/png": image, "text/plain": ["<Figure>"]}}],
+        })
+    path.write_text(json.dumps(notebook), encoding="utf-8")
+
+
+def bench_reader(name: str, path: Path, repeat: int) -> dict:
+    durations, peaks = [], []
+    for _ in range(repeat):
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        with open(path, "rb") as f:
+            chunks = list(notebook_chunks(READERS[name](f)))
+        durations.append(time.perf_counter() - t0)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return {
+        "reader": name,
+        "mean_ms": 1000 * sum(durations) / len(durations),
+        "peak_mb": max(peaks) / 1024 ** 2,
+        "cells": len(chunks),
+        "chars": sum(len(c["text"]) for c in chunks),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de lecture des notebooks (temps et mémoire)")
+    parser.add_argument("notebooks", nargs="*", help="Fichiers .ipynb (à défaut, un notebook synthétique est généré)")
+    parser.add_argument("--cells", type=int, default=200, help="Cellules de code du notebook synthétique")
+    parser.add_argument("--output-kb", type=int, default=256, help="Taille de la sortie image de chaque cellule (Ko)")
+    parser.add_argument("--repeat", type=int, default=3, help="Nombre de lectures par fichier")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [Path(p) for p in args.notebooks]
+        if not paths:
+            paths = [Path(tmp) / "synthetique.ipynb"]
+            make_notebook(paths[0], args.cells, args.output_kb)
+
+        for path in paths:
+            print(f"📓 {path.name} : {path.stat().st_size / 1024 ** 2:.1f} Mo, {args.repeat} lecture(s)")
+            print(f"{'lecteur':<10} {'moy. ms':>10} {'pic Mo':>9} {'cellules':>9} {'caractères':>11}")
+            for name in READERS:
+                r = bench_reader(name, path, args.repeat)
+                print(f"{r['reader']:<10} {r['mean_ms']:>10.1f} {r['peak_mb']:>9.1f} {r['cells']:>9} {r['chars']:>11}")
+            print()
+
+
+if __name__ == "__main__":
+    main()
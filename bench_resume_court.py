@@ -0,0 +1,104 @@
+# bench_resume_court.py
+# Compare les modes du résumé court de test_synthese_pdf.py (serial, parallel, incremental) :
+# durée totale, temps d'attente après la synthèse et tokens envoyés / générés.
+import argparse
+import re
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import instrumentation
+import llm_cache
+import test_synthese_pdf as synthese
+from pages_io import estimate_tokens, iter_pages
+
+
+class SimulatedModels:
+    """Modèle simulé : délai avant le premier token puis débit constant, longueur demandée
+    dans le prompt (« N mots ») respectée, titres de section réguliers. Permet de comparer
+    les modes sans appel ni coût."""
+
+    def __init__(self, ttft: float, tokens_per_s: float, output_tokens: int):
+        self.ttft = ttft
+        self.tokens_per_s = tokens_per_s
+        self.output_tokens = output_tokens
+
+    def _answer(self, contents, config) -> tuple:
+        prompt = "".join(part.text or "" for c in contents for part in c.parts)
+        requested = [int(n) for n in re.findall(r"(\d+) mots", prompt)]
+        tokens = round(max(requested) * 4 / 3) if requested else config.max_output_tokens // 8
+        return estimate_tokens(prompt), min(self.output_tokens, tokens)
+
+    def _text(self, start: int, tokens: int) -> str:
+        # 3 mots pour 4 tokens, un titre de section tous les 500 tokens
+        return "".join(f"\n## Section {i // 500 + 1}\n" if i % 500 == 0 else "" if i % 4 == 3 else "mot "
+                       for i in range(start, start + tokens))
+
+    def generate_content(self, model, contents, config):
+        prompt_tokens, tokens = self._answer(contents, config)
+        time.sleep(self.ttft + tokens / self.tokens_per_s)
+        usage = SimpleNamespace(prompt_token_count=prompt_tokens, candidates_token_count=tokens)
+        return SimpleNamespace(text=self._text(0, tokens), usage_metadata=usage)
+
+    def generate_content_stream(self, model, contents, config):
+        prompt_tokens, tokens = self._answer(contents, config)
+        time.sleep(self.ttft)
+        step = 50
+        for start in range(0, tokens, step):
+            n = min(step, tokens - start)
+            time.sleep(n / self.tokens_per_s)
+            usage = SimpleNamespace(prompt_token_count=prompt_tokens, candidates_token_count=start + n)
+            yield SimpleNamespace(text=self._text(start, n), usage_metadata=usage)
+
+
+def llm_totals() -> dict:
+    totals = {"calls": 0, "prompt_tokens": 0, "output_tokens": 0}
+    for s in instrumentation.RECORDER.spans:
+        if s.name == "llm":
+            totals["calls"] += 1
+            totals["prompt_tokens"] += s.totals.get("prompt_tokens", 0)
+            totals["output_tokens"] += s.totals.get("output_tokens", 0)
+    return totals
+
+
+def bench_mode(client, texts: list, mode: str, extra: list) -> dict:
+    args = synthese.build_parser().parse_args(["--pdf", "bench", "--no-llm-cache", "--short-summary", mode] + extra)
+    llm_cache.configure(args)
+    instrumentation.RECORDER = instrumentation.Recorder()
+    with tempfile.TemporaryDirectory() as out_dir:
+        t0 = time.perf_counter()
+        result = synthese.synthesize_document(client, "bench", texts, args, out_dir=out_dir, verbose=False)
+        total = time.perf_counter() - t0
+    return {"mode": mode, "total": total, "wait": result["phases"]["resume_court"], **llm_totals()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des modes du résumé court (serial, parallel, incremental)",
+                                     allow_abbrev=False)  # --mode est transmis à test_synthese_pdf
+    parser.add_argument("input", help="Pages extraites (.json, .jsonl ou .jsonl.zst)")
+    parser.add_argument("--modes", default=",".join(synthese.SHORT_SUMMARY_MODES), help="Modes à comparer, séparés par des virgules")
+    parser.add_argument("--repeat", type=int, default=1, help="Nombre d'exécutions par mode")
+    parser.add_argument("--simulate", action="store_true", help="Modèle simulé au lieu de Gemini (aucun appel facturé)")
+    parser.add_argument("--ttft", type=float, default=1.0, help="Simulation : délai avant le premier token (s)")
+    parser.add_argument("--tokens-per-s", type=float, default=1000, help="Simulation : débit de génération")
+    parser.add_argument("--output-tokens", type=int, default=4000, help="Simulation : longueur maximale d'une réponse")
+    args, extra = parser.parse_known_args()  # les autres options sont transmises à test_synthese_pdf
+
+    texts = [page.get("markdown", "") for page in iter_pages(args.input)]
+    if args.simulate:
+        client = SimpleNamespace(models=SimulatedModels(args.ttft, args.tokens_per_s, args.output_tokens))
+    else:
+        client = synthese.gemini_client()
+
+    print(f"📄 {args.input} : {len(texts)} pages, {estimate_tokens(''.join(texts))} tokens estimés, "
+          f"{args.repeat} exécution(s) par mode{' (simulation)' if args.simulate else ''}", file=sys.stderr)
+    print(f"{'mode':<12} {'total s':>8} {'attente s':>10} {'appels':>7} {'tokens in':>10} {'tokens out':>11}")
+    for mode in args.modes.split(","):
+        runs = [bench_mode(client, texts, mode, extra) for _ in range(args.repeat)]
+        r = {key: sum(run[key] for run in runs) / len(runs) for key in ("total", "wait", "calls", "prompt_tokens", "output_tokens")}
+        print(f"{mode:<12} {r['total']:>8.1f} {r['wait']:>10.1f} {r['calls']:>7.0f} {r['prompt_tokens']:>10.0f} {r['output_tokens']:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
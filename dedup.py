@@ -0,0 +1,137 @@
+# coding: utf-8
+"""Détection des doublons d'un lot : URLs canoniques et empreintes de contenu.
+
+Deux niveaux :
+- avant extraction, les URLs qui désignent la même page (paramètres de suivi,
+  version AMP, www./m.) sont ramenées à une forme canonique ;
+- après extraction, le texte est comparé par empreinte exacte (SHA-256) puis par
+  SimHash 64 bits : deux documents à moins de `max_distance` bits d'écart sont
+  considérés comme la même page (miroir, mise en forme différente...).
+"""
+import hashlib
+import re
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid",
+    "si", "gi", "cmpid", "_hsenc", "_hsmi", "amp", "outputtype",
+}
+# `ref` désigne ailleurs une branche ou une version (GitHub, docs) : retiré seulement ici
+HOST_TRACKING_PARAMS = {
+    "twitter.com": {"ref_src", "ref_url"},
+    "x.com": {"ref_src", "ref_url"},
+    "producthunt.com": {"ref"},
+    "news.ycombinator.com": {"ref"},
+}
+HOST_PREFIXES = ("www.", "m.", "amp.", "mobile.")
+
+SIMHASH_BITS = 64
+MIN_WORDS = 50  # en dessous, seule l'empreinte exacte est fiable
+
+
+def canonical_url(url: str) -> str:
+    """Forme canonique d'une URL pour repérer les copies d'une même page.
+
+    Supprime les paramètres de suivi (utm_*, fbclid..., `ref` sur quelques hôtes),
+    le fragment, les préfixes d'hôte www./m./amp. et les suffixes AMP du chemin.
+    Les chemins locaux sont renvoyés tels quels.
+    """
+    url = url.strip()
+    if not re.match(r"https?://", url, re.IGNORECASE):
+        return url
+    parsed = urlparse(url)
+    host = (parsed.hostname or "").lower()
+    for prefix in HOST_PREFIXES:
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    if parsed.port and parsed.port not in (80, 443):
+        host = f"{host}:{parsed.port}"
+
+    path = re.sub(r"/+", "/", parsed.path or "/")
+    path = re.sub(r"(/amp|\.amp|/amp\.html)/?$", "", path, flags=re.IGNORECASE) or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+
+    tracking = TRACKING_PARAMS | HOST_TRACKING_PARAMS.get(host, set())
+    query = [
+        (k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in tracking
+    ]
+    return urlunparse(("https", host, path, "", urlencode(sorted(query)), ""))
+
+
+def _word_hash(shingle: str) -> int:
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class SimHasher:
+    """SimHash incrémental sur des triplets de mots : le texte peut arriver morceau par morceau."""
+
+    def __init__(self, shingle: int = 3):
+        self.shingle = shingle
+        self.weights = [0] * SIMHASH_BITS
+        self.words = 0
+        self._tail = []
+
+    def update(self, text: str):
+        import numpy as np
+
+        words = self._tail + re.findall(r"\w+", text.lower())
+        hashes = np.array(
+            [_word_hash(" ".join(words[i:i + self.shingle])) for i in range(len(words) - self.shingle + 1)],
+            dtype=np.uint64,
+        )
+        if hashes.size:
+            # Pour chaque bit : +1 par triplet où il vaut 1, -1 sinon
+            bits = (hashes[:, None] >> np.arange(SIMHASH_BITS, dtype=np.uint64)) & np.uint64(1)
+            self.weights = self.weights + (2 * bits.sum(axis=0, dtype=np.int64) - hashes.size)
+        self.words += len(words) - len(self._tail)
+        self._tail = words[-(self.shingle - 1):] if self.shingle > 1 else []
+
+    def digest(self) -> int:
+        return sum(1 << bit for bit, w in enumerate(self.weights) if w > 0)
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class DuplicateIndex:
+    """Index des documents déjà retenus, interrogé dans l'ordre du lot.
+
+    La recherche SimHash découpe l'empreinte en `max_distance + 1` bandes : deux
+    empreintes à au plus `max_distance` bits d'écart partagent au moins une bande
+    identique, on ne compare donc que les candidats d'une même bande.
+    """
+
+    def __init__(self, max_distance: int = 3):
+        self.max_distance = max_distance
+        self.bands = max_distance + 1
+        self._exact = {}
+        self._buckets = {}
+
+    def _band_keys(self, simhash: int):
+        width = SIMHASH_BITS // self.bands
+        for band in range(self.bands):
+            yield band, simhash >> (band * width) & ((1 << width) - 1)
+
+    def find(self, content_hash: str, simhash: Optional[int]) -> Optional[tuple]:
+        """Retourne (document canonique, raison, distance) si le contenu est déjà connu."""
+        if content_hash in self._exact:
+            return self._exact[content_hash], "identique", 0
+        if simhash is None:
+            return None
+        best = None
+        for key in self._band_keys(simhash):
+            for candidate, doc in self._buckets.get(key, ()):
+                distance = hamming(simhash, candidate)
+                if distance <= self.max_distance and (best is None or distance < best[2]):
+                    best = (doc, "quasi-identique", distance)
+        return best
+
+    def add(self, doc: str, content_hash: str, simhash: Optional[int]):
+        self._exact.setdefault(content_hash, doc)
+        if simhash is not None:
+            for key in self._band_keys(simhash):
+                self._buckets.setdefault(key, []).append((simhash, doc))
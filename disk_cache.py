@@ -0,0 +1,148 @@
+# coding: utf-8
+"""Cache disque clé/valeur (JSON) avec expiration et taille bornée."""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Union
+
+
+def cache_key(*parts) -> str:
+    """Construit une clé stable (SHA-256) à partir de plusieurs composants."""
+    return hashlib.sha256("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    """Stocke une valeur JSON par fichier sous `directory`.
+
+    - `ttl` (secondes) : au-delà, l'entrée est considérée comme expirée et supprimée.
+    - `max_bytes` : taille totale maximale ; les entrées les moins récemment
+      utilisées sont évincées en premier (la date d'accès est portée par le mtime).
+
+    La taille totale est suivie à chaque écriture : le dossier n'est parcouru qu'au
+    premier `set`, lors d'une éviction, et toutes les `RESCAN_EVERY` écritures (pour
+    tenir compte des autres processus qui partagent le cache).
+    """
+
+    RESCAN_EVERY = 500
+
+    def __init__(self, directory: Union[str, Path], ttl: Optional[float] = 7 * 24 * 3600,
+                 max_bytes: Optional[int] = 500 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = None  # taille totale connue, None tant que le dossier n'a pas été parcouru
+        self._writes = 0
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get_entry(self, key: str) -> Optional[dict]:
+        """Retourne l'entrée complète (`value`, `meta`, `stored_at`) ou None."""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if self.ttl is not None and time.time() - entry.get("stored_at", 0) > self.ttl:
+            self.delete(key)
+            return None
+
+        try:
+            os.utime(path)  # marque l'entrée comme récemment utilisée
+        except OSError:
+            pass
+        return entry
+
+    def get(self, key: str):
+        entry = self.get_entry(key)
+        return entry["value"] if entry else None
+
+    def set(self, key: str, value, meta: Optional[dict] = None):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        entry = {"stored_at": time.time(), "meta": meta or {}, "value": value}
+        old_size = _file_size(path)
+
+        # Écriture atomique : plusieurs workers peuvent écrire en même temps
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._evict(_file_size(path) - old_size)
+
+    def delete(self, key: str):
+        path = self._path(key)
+        size = _file_size(path)
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            return
+        with self._lock:
+            if self._size is not None:
+                self._size -= size
+
+    def purge(self):
+        """Vide entièrement le cache."""
+        with self._lock:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._size = 0
+
+    def _scan(self) -> tuple:
+        files = []
+        total = 0
+        for path in self.directory.glob("*/*.json"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+        return files, total
+
+    def _evict(self, delta: int = 0):
+        if self.max_bytes is None:
+            return
+        with self._lock:
+            self._writes += 1
+            if self._size is not None and self._writes % self.RESCAN_EVERY:
+                self._size += delta
+                if self._size <= self.max_bytes:
+                    return
+            files, total = self._scan()
+            self._size = total
+            if total <= self.max_bytes:
+                return
+
+            # On redescend sous 90 % de la limite pour ne pas évincer à chaque écriture
+            target = self.max_bytes * 0.9
+            for _, size, path in sorted(files):
+                if total <= target:
+                    break
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+                total -= size
+            self._size = total
+
+
+def _file_size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except FileNotFoundError:
+        return 0
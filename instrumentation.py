@@ -0,0 +1,222 @@
+# coding: utf-8
+"""Mesures du pipeline : spans chronométrés, compteurs et totaux (octets, tokens, caractères).
+
+    from instrumentation import span, count
+
+    with span("download", extractor="pdf_local") as s:
+        ...
+        s.add(bytes=len(content))
+        s.mark("first_token")   # jalon intermédiaire, ex. délai avant le premier token
+
+Toutes les mesures d'un processus vont dans un enregistreur partagé. En fin
+d'exécution, `report` affiche un tableau (nombre, p50, p95, totaux) par étape et
+par libellé (extracteur, API...), et écrit sur demande une trace JSON et un
+fichier texte Prometheus (collecteur « textfile » de node_exporter).
+"""
+import json
+import math
+import os
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+
+class Span:
+    """Une étape chronométrée ; `add` cumule des totaux, `mark` note un jalon."""
+
+    def __init__(self, name: str, labels: dict):
+        self.name = name
+        self.labels = labels
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        self.duration = None
+        self.totals = defaultdict(float)
+        self.marks = {}
+        self.error = None
+
+    def add(self, **totals):
+        for key, value in totals.items():
+            self.totals[key] += value
+
+    def mark(self, name: str):
+        """Enregistre le temps écoulé depuis le début du span (une seule fois par jalon)."""
+        self.marks.setdefault(name, time.perf_counter() - self._t0)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "labels": self.labels,
+            "start": self.start,
+            "duration": self.duration,
+            "totals": dict(self.totals),
+            "marks": self.marks,
+            "error": self.error,
+            "thread": threading.current_thread().name,
+        }
+
+
+class Recorder:
+    def __init__(self):
+        self.started = time.time()
+        self.spans = []
+        self.counters = defaultdict(float)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, **labels):
+        s = Span(name, {k: str(v) for k, v in labels.items() if v is not None})
+        try:
+            yield s
+        except BaseException as e:
+            s.error = type(e).__name__
+            raise
+        finally:
+            s.duration = time.perf_counter() - s._t0
+            with self._lock:
+                self.spans.append(s)
+
+    def count(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self.counters[key] += value
+
+    def _groups(self) -> dict:
+        """Durées, jalons et totaux regroupés par (nom, libellés)."""
+        groups = {}
+        with self._lock:
+            spans = list(self.spans)
+        for s in spans:
+            key = (s.name, tuple(sorted(s.labels.items())))
+            group = groups.setdefault(key, {"durations": [], "marks": defaultdict(list),
+                                            "totals": defaultdict(float), "errors": 0})
+            group["durations"].append(s.duration)
+            for mark, value in s.marks.items():
+                group["marks"][mark].append(value)
+            for total, value in s.totals.items():
+                group["totals"][total] += value
+            group["errors"] += s.error is not None
+        return groups
+
+    def summary_rows(self) -> list:
+        rows = []
+        for (name, labels), group in sorted(self._groups().items()):
+            series = [(name, group["durations"])]
+            series += [(f"{name}:{mark}", values) for mark, values in sorted(group["marks"].items())]
+            for i, (row_name, values) in enumerate(series):
+                rows.append({
+                    "name": row_name,
+                    "labels": dict(labels),
+                    "count": len(values),
+                    "errors": group["errors"] if i == 0 else 0,
+                    "p50": percentile(values, 50),
+                    "p95": percentile(values, 95),
+                    "total": sum(values),
+                    "totals": dict(group["totals"]) if i == 0 else {},
+                })
+        return rows
+
+    def print_summary(self, file=sys.stderr):
+        rows = self.summary_rows()
+        if not rows:
+            return
+        print("\n⏱️ Mesures par étape", file=file)
+        print(f"   {'étape':<24} {'libellés':<48} {'n':>5} {'err':>4} {'p50 s':>8} {'p95 s':>8} {'total s':>9}  totaux",
+              file=file)
+        for r in rows:
+            totals = ", ".join(f"{k}={v:,.0f}" for k, v in sorted(r["totals"].items()))
+            label = ",".join(f"{k}={v}" for k, v in r["labels"].items())
+            print(f"   {r['name']:<24} {label[:48]:<48} {r['count']:>5} {r['errors']:>4} "
+                  f"{r['p50']:>8.3f} {r['p95']:>8.3f} {r['total']:>9.2f}  {totals}", file=file)
+        with self._lock:
+            counters = sorted(self.counters.items())
+        for (name, labels), value in counters:
+            label = ",".join(f"{k}={v}" for k, v in labels)
+            print(f"   # {name}{f' [{label}]' if label else ''} : {value:,.0f}", file=file)
+
+    def write_json(self, path: Path, run: str):
+        with self._lock:
+            spans = [s.to_dict() for s in self.spans]
+            counters = [{"name": n, "labels": dict(l), "value": v} for (n, l), v in self.counters.items()]
+        trace = {"run": run, "started": self.started, "finished": time.time(),
+                 "spans": spans, "counters": counters, "summary": self.summary_rows()}
+        path.write_text(json.dumps(trace, ensure_ascii=False, indent=1), encoding="utf-8")
+
+    def write_prometheus(self, path: Path, run: str):
+        lines = [
+            "# HELP podcastify_span_seconds Durée des étapes du pipeline.",
+            "# TYPE podcastify_span_seconds summary",
+        ]
+        totals_lines = []
+        for r in self.summary_rows():
+            labels = _prom_labels(run=run, span=r["name"], **r["labels"])
+            for q, key in (("0.5", "p50"), ("0.95", "p95")):
+                lines.append(f'podcastify_span_seconds{{{labels},quantile="{q}"}} {r[key]:.6f}')
+            lines.append(f"podcastify_span_seconds_sum{{{labels}}} {r['total']:.6f}")
+            lines.append(f"podcastify_span_seconds_count{{{labels}}} {r['count']}")
+            for unit, value in sorted(r["totals"].items()):
+                totals_lines.append(f'podcastify_span_total{{{labels},unit="{_prom_escape(unit)}"}} {value:g}')
+        lines += ["# HELP podcastify_span_total Octets, tokens ou caractères traités par étape.",
+                  "# TYPE podcastify_span_total counter"] + totals_lines
+        lines += ["# HELP podcastify_events_total Compteurs d'événements (cache, erreurs...).",
+                  "# TYPE podcastify_events_total counter"]
+        with self._lock:
+            counters = sorted(self.counters.items())
+        for (name, labels), value in counters:
+            lines.append(f"podcastify_events_total{{{_prom_labels(run=run, event=name, **dict(labels))}}} {value:g}")
+        # Écriture atomique : le collecteur ne doit jamais lire un fichier à moitié écrit
+        tmp = path.with_suffix(".prom.tmp")
+        tmp.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        os.replace(tmp, path)
+
+
+def percentile(values: list, q: float) -> float:
+    """Percentile au rang le plus proche (0 si aucune valeur)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))]
+
+
+def _prom_escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def _prom_labels(**labels) -> str:
+    return ",".join(f'{re.sub(r"[^a-zA-Z0-9_]", "_", k)}="{_prom_escape(v)}"' for k, v in labels.items())
+
+
+RECORDER = Recorder()
+
+
+def span(name: str, **labels):
+    """Chronomètre un bloc dans l'enregistreur partagé (voir `Recorder.span`)."""
+    return RECORDER.span(name, **labels)
+
+
+def count(name: str, value: float = 1, **labels):
+    RECORDER.count(name, value, **labels)
+
+
+def add_arguments(parser):
+    """Option `--metrics DOSSIER` commune aux scripts du pipeline."""
+    parser.add_argument("--metrics", metavar="DOSSIER",
+                        help="Écrire une trace JSON et un fichier Prometheus des mesures dans ce dossier")
+
+
+def report(run: str, metrics_dir: Optional[str] = None):
+    """Affiche le tableau des mesures et, si demandé, écrit `<run>-<horodatage>.trace.json`
+    et `<run>.prom` (remplacé à chaque exécution) dans `metrics_dir`."""
+    RECORDER.print_summary()
+    if not metrics_dir:
+        return
+    directory = Path(metrics_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    trace_path = directory / f"{run}-{time.strftime('%Y%m%d-%H%M%S')}.trace.json"
+    RECORDER.write_json(trace_path, run)
+    RECORDER.write_prometheus(directory / f"{run}.prom", run)
+    print(f"📈 Mesures : {trace_path}, {directory / f'{run}.prom'}", file=sys.stderr)
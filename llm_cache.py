@@ -0,0 +1,129 @@
+# coding: utf-8
+"""Cache persistant des réponses LLM (Gemini, OpenAI), pour ne pas repayer une requête déjà faite.
+
+La clé est le SHA-256 du fournisseur, du modèle, du prompt rendu (texte ou messages)
+et des paramètres d'échantillonnage : relancer `make synthese` ou régénérer un
+podcast sur le même texte relit la réponse sur disque, sans appel ni coût. Les
+entrées expirent après `ttl` et le cache est borné en taille (éviction des moins
+récemment utilisées, voir `DiskCache`). Une réponse en flux est rejouée morceau
+par morceau, et n'est enregistrée que si le flux est allé jusqu'au bout.
+
+    import llm_cache
+
+    key = llm_cache.key("gemini", model, prompt, temperature=0.5)
+    for chunk in llm_cache.stream(key, lambda: client.models.generate_content_stream(...)):
+        print(chunk.text, end="")
+
+Scripts : options `--no-llm-cache` et `--llm-cache-ttl` (voir `add_arguments`).
+Application Gradio : PODCASTIFY_LLM_CACHE=off désactive le cache.
+"""
+import json
+import os
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional
+
+import instrumentation
+from disk_cache import DiskCache, cache_key
+
+CACHE_ENV = "PODCASTIFY_LLM_CACHE"
+CACHE_DIR_ENV = "PODCASTIFY_LLM_CACHE_DIR"
+DEFAULT_DIR = ".cache/llm"
+DEFAULT_TTL_DAYS = 30
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+KEY_VERSION = "llm-v1"  # à changer si le format des entrées évolue
+REPLAY_CHARS = 2000     # taille des morceaux rejoués depuis le cache
+
+
+class CachedChunk:
+    """Morceau rejoué depuis le cache : même interface minimale qu'un morceau de flux Gemini."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.usage_metadata = None  # rien n'est facturé
+
+
+class LLMCache:
+    def __init__(self, directory: Optional[str] = None, ttl_days: Optional[float] = DEFAULT_TTL_DAYS,
+                 max_bytes: Optional[int] = DEFAULT_MAX_BYTES, enabled: bool = True):
+        self.enabled = enabled
+        self.directory = Path(directory or os.getenv(CACHE_DIR_ENV) or DEFAULT_DIR)
+        ttl = ttl_days * 24 * 3600 if ttl_days else None
+        self._store = DiskCache(self.directory, ttl=ttl, max_bytes=max_bytes) if enabled else None
+
+    def get(self, key: str):
+        if self._store is None:
+            return None
+        value = self._store.get(key)
+        instrumentation.count("cache", cache="llm", result="miss" if value is None else "hit")
+        return value
+
+    def set(self, key: str, value, meta: Optional[dict] = None):
+        if self._store is not None and value is not None:
+            self._store.set(key, value, meta)
+
+    def complete(self, key: str, call: Callable):
+        """Valeur en cache, sinon résultat de `call()` (JSON sérialisable), mis en cache."""
+        value = self.get(key)
+        if value is None:
+            value = call()
+            self.set(key, value)
+        return value
+
+    def stream(self, key: str, call: Callable[[], Iterable]) -> Iterator:
+        """Rejoue la réponse en cache sous forme de `CachedChunk`, sinon relaie les morceaux
+        de `call()` (objets ayant un attribut `text`) et enregistre le texte complet."""
+        value = self.get(key)
+        if value is not None:
+            for start in range(0, len(value), REPLAY_CHARS):
+                yield CachedChunk(value[start:start + REPLAY_CHARS])
+            return
+        parts = []
+        for chunk in call():
+            parts.append(chunk.text or "")
+            yield chunk
+        self.set(key, "".join(parts))
+
+
+def key(provider: str, model: str, prompt, **params) -> str:
+    """Clé d'une requête : `prompt` est un texte ou une structure JSON (messages, contenus)."""
+    def dumps(value) -> str:
+        return json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+
+    return cache_key(KEY_VERSION, provider, model, dumps(prompt), dumps(params))
+
+
+_cache = None
+
+
+def _enabled_by_env() -> bool:
+    return os.getenv(CACHE_ENV, "").lower() not in ("off", "0", "false", "no")
+
+
+def shared_cache() -> LLMCache:
+    """Cache partagé du processus ; désactivé si PODCASTIFY_LLM_CACHE vaut `off`."""
+    global _cache
+    if _cache is None:
+        _cache = LLMCache(enabled=_enabled_by_env())
+    return _cache
+
+
+def complete(key: str, call: Callable):
+    return shared_cache().complete(key, call)
+
+
+def stream(key: str, call: Callable[[], Iterable]) -> Iterator:
+    return shared_cache().stream(key, call)
+
+
+def add_arguments(parser):
+    """Options `--no-llm-cache` et `--llm-cache-ttl` communes aux scripts qui appellent un LLM."""
+    parser.add_argument("--no-llm-cache", action="store_true",
+                        help=f"Ni lire ni écrire le cache des réponses LLM ({DEFAULT_DIR})")
+    parser.add_argument("--llm-cache-ttl", type=float, default=DEFAULT_TTL_DAYS, metavar="JOURS",
+                        help="Durée de validité des réponses en cache (0 : sans expiration)")
+
+
+def configure(args):
+    """Remplace le cache partagé d'après `add_arguments`."""
+    global _cache
+    _cache = LLMCache(ttl_days=args.llm_cache_ttl, enabled=not args.no_llm_cache and _enabled_by_env())
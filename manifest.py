@@ -0,0 +1,139 @@
+# coding: utf-8
+"""Manifeste SQLite des lots d'extraction : un enregistrement par URL, mis à jour au fil de l'eau."""
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Union
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS urls (
+    url             TEXT PRIMARY KEY,
+    status          TEXT NOT NULL,          -- pending, done, failed, duplicate
+    md_path         TEXT,
+    json_path       TEXT,
+    content_hash    TEXT,
+    duration        REAL,
+    error           TEXT,
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    updated_at      REAL NOT NULL,
+    next_attempt_at REAL,
+    simhash         TEXT,                   -- SimHash 64 bits du texte, en hexadécimal
+    duplicate_of    TEXT                    -- URL du document retenu pour un doublon
+)
+"""
+
+# Colonnes ajoutées après coup : complétées à l'ouverture d'un manifeste plus ancien
+LATE_COLUMNS = {"simhash": "TEXT", "duplicate_of": "TEXT"}
+
+RESUME, RETRY_FAILED, FORCE = "resume", "retry-failed", "force"
+
+
+class BatchManifest:
+    """Suit l'état de chaque URL pour pouvoir reprendre un lot interrompu.
+
+    - `resume` : ignore les URLs terminées dont les fichiers produits existent encore ; les échecs ne sont retentés qu'une fois
+      leur délai (backoff exponentiel) écoulé et tant que `max_attempts` n'est pas atteint.
+    - `retry-failed` : retente tout de suite toutes les URLs en échec.
+    - `force` : retraite tout.
+    """
+
+    def __init__(self, path: Union[str, Path], backoff: float = 60.0, max_attempts: int = 5):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.backoff = backoff
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(SCHEMA)
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(urls)")}
+        for name, kind in LATE_COLUMNS.items():
+            if name not in columns:
+                self._conn.execute(f"ALTER TABLE urls ADD COLUMN {name} {kind}")
+
+    def get(self, url: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM urls WHERE url = ?", (url,)).fetchone()
+        return dict(row) if row else None
+
+    def should_process(self, url: str, mode: str = RESUME) -> tuple:
+        """Retourne (à traiter, raison) pour une URL selon le mode de reprise."""
+        entry = self.get(url)
+        if mode == FORCE or entry is None or entry["status"] == "pending":
+            return True, "nouvelle" if entry is None else "reprise"
+        if entry["status"] == "done":
+            missing = [p for p in (entry["md_path"], entry["json_path"]) if p and not Path(p).exists()]
+            if missing:
+                return True, f"fichier absent ({missing[0]})"
+            return False, "déjà faite"
+        if entry["status"] == "duplicate":
+            return False, f"doublon de {entry['duplicate_of']}"
+        if mode == RETRY_FAILED:
+            return True, "nouvel essai"
+        if entry["attempts"] >= self.max_attempts:
+            return False, f"abandonnée après {entry['attempts']} essais"
+        if (entry["next_attempt_at"] or 0) > time.time():
+            return False, "en attente avant nouvel essai"
+        return True, "nouvel essai"
+
+    def mark_pending(self, url: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO urls (url, status, updated_at) VALUES (?, 'pending', ?) "
+                "ON CONFLICT(url) DO UPDATE SET status = 'pending', updated_at = excluded.updated_at",
+                (url, time.time()),
+            )
+
+    def mark_done(self, url: str, md_path: str, json_path: str, content_hash: str, duration: float,
+                  simhash: Optional[int] = None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE urls SET status = 'done', md_path = ?, json_path = ?, content_hash = ?, duration = ?, "
+                "error = NULL, attempts = attempts + 1, updated_at = ?, next_attempt_at = NULL, "
+                "simhash = ?, duplicate_of = NULL WHERE url = ?",
+                (md_path, json_path, content_hash, duration, time.time(),
+                 None if simhash is None else f"{simhash:016x}", url),
+            )
+
+    def mark_duplicate(self, url: str, duplicate_of: str, duration: float, content_hash: Optional[str] = None):
+        """Le contenu de `url` est celui de `duplicate_of` : aucun fichier n'est produit."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO urls (url, status, updated_at) VALUES (?, 'duplicate', ?) "
+                "ON CONFLICT(url) DO NOTHING",
+                (url, time.time()),
+            )
+            self._conn.execute(
+                "UPDATE urls SET status = 'duplicate', duplicate_of = ?, content_hash = ?, duration = ?, "
+                "md_path = NULL, json_path = NULL, error = NULL, attempts = attempts + 1, updated_at = ?, "
+                "next_attempt_at = NULL WHERE url = ?",
+                (duplicate_of, content_hash, duration, time.time(), url),
+            )
+
+    def fingerprints(self) -> list:
+        """(url, empreinte exacte, SimHash) des documents terminés, pour repérer les doublons entre lots."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url, content_hash, simhash FROM urls WHERE status = 'done' AND content_hash IS NOT NULL"
+            ).fetchall()
+        return [(url, content_hash, int(simhash, 16) if simhash else None) for url, content_hash, simhash in rows]
+
+    def mark_failed(self, url: str, error: str, duration: float):
+        with self._lock:
+            attempts = (self._conn.execute("SELECT attempts FROM urls WHERE url = ?", (url,)).fetchone() or [0])[0]
+            now = time.time()
+            self._conn.execute(
+                "UPDATE urls SET status = 'failed', error = ?, duration = ?, attempts = ?, updated_at = ?, "
+                "next_attempt_at = ? WHERE url = ?",
+                (error, duration, attempts + 1, now, now + self.backoff * 2 ** attempts, url),
+            )
+
+    def counts(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM urls GROUP BY status").fetchall()
+        return {status: n for status, n in rows}
+
+    def close(self):
+        self._conn.close()
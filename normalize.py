@@ -0,0 +1,290 @@
+# coding: utf-8
+"""Nettoyage du texte extrait avant les appels LLM, pour ne pas payer de tokens inutiles.
+
+Chaque règle peut être désactivée séparément :
+- `headers_footers` : lignes répétées en haut ou en bas de la plupart des pages
+  (titre courant, numéro de page, mention de copyright) ;
+- `dehyphenate` : mots coupés en fin de ligne ("synthé-\\ntiser") et césures conditionnelles ;
+- `references` : bloc de bibliographie / liste de références en fin de document (titre
+  proche de la fin, ou suivi de lignes qui ont la forme de citations), jusqu'au titre
+  suivant : les sections qui le suivent (quiz, annexes) sont conservées ;
+- `boilerplate` : lignes courtes de cookies, partage, abonnement répétées sur plusieurs
+  pages, et lignes de navigation isolées des pages web. Pour un PDF ou un notebook, la
+  règle ne s'applique que sur demande (`--normalize-boilerplate`) ;
+- `whitespace` : espaces multiples, espaces en fin de ligne et lignes vides en série.
+"""
+import argparse
+import re
+import sys
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional
+
+from pages_io import estimate_tokens
+
+RULES = ("headers_footers", "dehyphenate", "references", "boilerplate", "whitespace")
+RULE_LABELS = {
+    "headers_footers": "en-têtes/pieds",
+    "dehyphenate": "césures",
+    "references": "références",
+    "boilerplate": "boilerplate",
+    "whitespace": "espaces",
+}
+
+REFERENCES_RE = re.compile(
+    r"^\W*(references|r[ée]f[ée]rences|bibliograph(y|ie)|notes et r[ée]f[ée]rences|works cited|sources)\W*$",
+    re.IGNORECASE,
+)
+HEADING_RE = re.compile(r"^\s*(#{1,6})\s+\S")
+APPENDIX_RE = re.compile(r"^\W*(appendix|appendices|annexes?)\b", re.IGNORECASE)
+CITATION_RE = re.compile(
+    r"^\s*(\[\d+\]|\d+\.\s|[-*•]\s)|\((19|20)\d{2}[a-z]?\)|\b(doi|arxiv|isbn)\b|https?://|\bet al\.|"
+    r"\b(19|20)\d{2}\b.*\b(pp?\.|vol\.|journal|proceedings|press)",
+    re.IGNORECASE,
+)
+BOILERPLATE_RE = re.compile(
+    r"\b(cookies?|accept(er)? (all|tout)|skip to (main )?content|aller au contenu|subscribe|abonnez-vous|"
+    r"newsletter|sign (up|in)|log ?in|se connecter|share (on|this)|partager (sur|cet)|follow us|suivez-nous|"
+    r"all rights reserved|tous droits réservés|read more|lire (la suite|aussi)|advertisement|publicité)\b",
+    re.IGNORECASE,
+)
+NAV_LINE_RE = re.compile(
+    r"^\W*(menu|home|accueil|search|rechercher|print|imprimer|top|retour en haut)\W*$",
+    re.IGNORECASE,
+)
+BOILERPLATE_SOURCES = ("html",)  # ailleurs (pdf, notebook, texte), la règle est à activer explicitement
+
+
+@dataclass
+class NormalizeOptions:
+    headers_footers: bool = True
+    dehyphenate: bool = True
+    references: bool = True
+    boilerplate: bool = True
+    whitespace: bool = True
+    source: str = "html"         # type de source (voir `source_kind`) : html, pdf, notebook ou text
+    boilerplate_any_source: bool = False  # appliquer `boilerplate` hors des pages web
+    edge_lines: int = 2          # lignes examinées en haut et en bas de chaque page
+    repeat_ratio: float = 0.5    # part des pages où une ligne doit revenir pour être un en-tête/pied
+    min_pages: int = 3           # en dessous, pas de détection d'en-têtes/pieds
+    header_max_words: int = 15   # un en-tête ou pied de page est une ligne courte
+    boilerplate_max_words: int = 12  # une ligne plus longue n'est jamais considérée comme boilerplate
+    references_tail: float = 0.2     # un titre de bibliographie dans cette dernière part du texte suffit
+    citation_lines: int = 3          # lignes examinées après un titre de bibliographie plus haut
+
+
+def _line_key(line: str) -> str:
+    """Clé de comparaison d'une ligne : les numéros (de page) ne comptent pas."""
+    return re.sub(r"\b\d+\b", "#", " ".join(line.split()).lower())
+
+
+def _edge_indexes(lines: list, options: NormalizeOptions) -> set:
+    """Lignes courtes en haut et en bas d'une page ; aucune si la page se réduit à ses bords
+    (paragraphe web, segment de transcription)."""
+    non_empty = [i for i, line in enumerate(lines) if line.strip()]
+    if len(non_empty) <= 2 * options.edge_lines:
+        return set()
+    edges = non_empty[:options.edge_lines] + non_empty[-options.edge_lines:]
+    return {i for i in edges if len(lines[i].split()) <= options.header_max_words}
+
+
+def strip_headers_footers(pages: list, options: NormalizeOptions) -> list:
+    if len(pages) < options.min_pages:
+        return pages
+    split = [page.splitlines() for page in pages]
+    seen = Counter()
+    for lines in split:
+        seen.update({_line_key(lines[i]) for i in _edge_indexes(lines, options)})
+    threshold = max(2, options.repeat_ratio * len(pages))
+    repeated = {key for key, n in seen.items() if n >= threshold}
+    if not repeated:
+        return pages
+
+    cleaned = []
+    for lines in split:
+        edges = _edge_indexes(lines, options)
+        cleaned.append("\n".join(
+            line for i, line in enumerate(lines) if not (i in edges and _line_key(line) in repeated)
+        ))
+    return cleaned
+
+
+def dehyphenate(text: str) -> str:
+    text = text.replace("\u00ad", "")
+    return re.sub(r"(\w)-[ \t]*\n[ \t]*([a-zà-öø-ÿ])", r"\1\2", text)
+
+
+def _followed_by_citations(lines: list, options: NormalizeOptions) -> bool:
+    """Les premières lignes qui suivent le titre ont-elles, pour la plupart, la forme de citations ?"""
+    following = [line for line in lines if line.strip()][:options.citation_lines]
+    return bool(following) and 2 * sum(bool(CITATION_RE.search(line)) for line in following) > len(following)
+
+
+def _heading_level(line: str) -> Optional[int]:
+    match = HEADING_RE.match(line)
+    return len(match.group(1)) if match else None
+
+
+def _is_references_heading(line: str) -> bool:
+    return bool(REFERENCES_RE.match(line.strip().strip("#*").strip()))
+
+
+def strip_references(pages: list, options: NormalizeOptions) -> list:
+    r"""Retire le dernier bloc de bibliographie de la seconde moitié du document, si son titre
+    est proche de la fin (`references_tail`) ou suivi de lignes en forme de citations.
+
+    Le bloc s'arrête au titre suivant de même niveau ou de niveau supérieur (ou à une
+    annexe) : les sections placées après la bibliographie sont conservées.
+
+    >>> strip_references(["Texte. " * 50 + "\n## Références\n[1] Doe (2020).\n## Quiz\nQ1 ?\n"],
+    ...                  NormalizeOptions())[0].endswith("Texte. \n## Quiz\nQ1 ?\n")
+    True
+    """
+    total = sum(len(page) for page in pages)
+    lines = []  # (page, position dans le document, ligne)
+    position = 0
+    for p, page in enumerate(pages):
+        for line in page.splitlines(keepends=True):
+            lines.append((p, position, line))
+            position += len(line)
+
+    block = None
+    for n, (p, at, line) in enumerate(lines):
+        if at < total / 2 or not _is_references_heading(line):
+            continue
+        following = [text for *_, text in lines[n + 1:n + 1 + 4 * options.citation_lines]]
+        if at >= total * (1 - options.references_tail) or _followed_by_citations(following, options):
+            block = n
+    if block is None:
+        return pages
+
+    # Fin du bloc : titre de même niveau ou supérieur (un titre sans `#` s'arrête à tout titre)
+    level = _heading_level(lines[block][2]) or 6
+    end = block + 1
+    while end < len(lines):
+        line = lines[end][2]
+        heading = _heading_level(line)
+        if (heading is not None and heading <= level and not _is_references_heading(line)) or APPENDIX_RE.match(line):
+            break
+        end += 1
+
+    dropped = set(range(block, end))
+    cleaned = [[] for _ in pages]
+    for n, (p, _, line) in enumerate(lines):
+        if n not in dropped:
+            cleaned[p].append(line)
+    return ["".join(page_lines) for page_lines in cleaned]
+
+
+def strip_boilerplate(pages: list, options: NormalizeOptions) -> list:
+    """Retire les lignes courtes de boilerplate répétées sur au moins deux pages et, pour
+    une page web, les lignes de navigation isolées (« Menu », « Accueil »...)."""
+    def candidate(line: str) -> bool:
+        return len(line.split()) <= options.boilerplate_max_words and bool(BOILERPLATE_RE.search(line))
+
+    seen = Counter()
+    for page in pages:
+        seen.update({_line_key(line) for line in page.splitlines() if candidate(line)})
+    repeated = {key for key, n in seen.items() if n >= 2}
+    html = options.source == "html"
+
+    def keep(line: str) -> bool:
+        if html and NAV_LINE_RE.match(line):
+            return False
+        return not (candidate(line) and _line_key(line) in repeated)
+
+    # Fins de ligne conservées : seul le retrait d'une ligne compte dans le rapport
+    return ["".join(line for line in page.splitlines(keepends=True) if keep(line)) for page in pages]
+
+
+def collapse_whitespace(text: str) -> str:
+    text = re.sub(r"[ \t\u00a0]+", " ", text)
+    text = re.sub(r" *\n *", "\n", text)
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+
+def _tokens(pages: list) -> int:
+    return sum(estimate_tokens(page) for page in pages)
+
+
+def normalize_pages(pages: list, options: Optional[NormalizeOptions] = None) -> tuple:
+    """Nettoie une liste de pages et retourne (pages nettoyées, rapport).
+
+    Le rapport donne les tokens estimés avant/après et le gain de chaque règle.
+    """
+    options = options or NormalizeOptions()
+    before = _tokens(pages)
+    saved = {}
+
+    steps = [
+        ("headers_footers", lambda ps: strip_headers_footers(ps, options)),
+        ("dehyphenate", lambda ps: [dehyphenate(p) for p in ps]),
+        ("references", lambda ps: strip_references(ps, options)),
+        ("boilerplate", lambda ps: strip_boilerplate(ps, options)),
+        ("whitespace", lambda ps: [collapse_whitespace(p) for p in ps]),
+    ]
+    for rule, step in steps:
+        if not getattr(options, rule):
+            continue
+        if rule == "boilerplate" and options.source not in BOILERPLATE_SOURCES and not options.boilerplate_any_source:
+            continue
+        tokens = _tokens(pages)
+        pages = step(pages)
+        saved[rule] = tokens - _tokens(pages)
+
+    after = _tokens(pages)
+    report = {"tokens_before": before, "tokens_after": after, "tokens_saved": before - after, "rules": saved}
+    return pages, report
+
+
+def normalize_text(text: str, options: Optional[NormalizeOptions] = None) -> tuple:
+    """Comme `normalize_pages` pour un texte ; les sauts de page (\\f) délimitent les pages s'il y en a."""
+    pages, report = normalize_pages(text.split("\f"), options)
+    return "\n\n".join(page for page in pages if page), report
+
+
+def source_kind(name: str, pages: Optional[list] = None) -> str:
+    """Type de source d'un document d'après son nom (URL, fichier, ou sortie d'Extraction.py
+    comme `rapport_pdf.json`) et ses pages : pdf, notebook, text ou html."""
+    if pages and any(isinstance(page, dict) and "cell_type" in page for page in pages):
+        return "notebook"
+    stem = re.sub(r"(\.jsonl?(\.zst)?)$", "", name.lower())
+    for kind, suffixes in (("pdf", (".pdf", "_pdf")), ("notebook", (".ipynb", "_ipynb")),
+                           ("text", (".md", ".txt", ".docx"))):
+        if stem.endswith(suffixes):
+            return kind
+    return "html"
+
+
+def print_report(name: str, report: dict):
+    before, saved = report["tokens_before"], report["tokens_saved"]
+    share = 100 * saved / before if before else 0.0
+    details = ", ".join(f"{RULE_LABELS[r]} {n}" for r, n in report["rules"].items() if n)
+    print(f"✂️ Normalisation de {name} : {before} → {report['tokens_after']} tokens estimés "
+          f"(-{saved}, {share:.1f} %){f' [{details}]' if details else ''}", file=sys.stderr)
+
+
+def parse_rules(value: str) -> set:
+    """Liste de règles séparées par des virgules (type argparse)."""
+    rules = {rule.strip() for rule in value.split(",") if rule.strip()}
+    unknown = rules - set(RULES)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"règle(s) inconnue(s) : {', '.join(sorted(unknown))} (choix : {', '.join(RULES)})")
+    return rules
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Options de ligne de commande communes aux scripts qui appellent un LLM."""
+    parser.add_argument("--no-normalize", action="store_true", help="Envoyer le texte extrait sans nettoyage")
+    parser.add_argument("--normalize-skip", type=parse_rules, default=set(),
+                        help=f"Règles de nettoyage à désactiver, séparées par des virgules ({','.join(RULES)})")
+    parser.add_argument("--normalize-boilerplate", action="store_true",
+                        help="Appliquer la règle boilerplate aussi aux PDF, notebooks et fichiers texte")
+
+
+def options_from_args(args, source: str = "html") -> Optional[NormalizeOptions]:
+    """NormalizeOptions d'après `add_arguments`, ou None si le nettoyage est désactivé."""
+    if args.no_normalize:
+        return None
+    return NormalizeOptions(source=source, boilerplate_any_source=args.normalize_boilerplate,
+                            **{rule: False for rule in args.normalize_skip})
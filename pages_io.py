@@ -0,0 +1,86 @@
+# coding: utf-8
+"""Lecture et écriture des pages extraites : JSON (format historique), JSONL et JSONL compressé zstd.
+
+En JSONL, la première ligne décrit le document ({"type": "document", ...}) et
+chaque ligne suivante est une page ou un segment : une étape ultérieure peut
+traiter les pages une à une sans charger tout le fichier.
+"""
+import io
+import json
+from pathlib import Path
+from typing import BinaryIO, Iterator, Union
+
+FORMATS = {"json": ".json", "jsonl": ".jsonl", "jsonl.zst": ".jsonl.zst"}
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimation grossière du nombre de tokens (≈ 4 caractères par token)."""
+    return (len(text) + 3) // 4
+
+
+class PagesWriter:
+    """Écrit les pages une par une dans `fileobj` (binaire) au format `fmt`."""
+
+    def __init__(self, fileobj: BinaryIO, fmt: str = "json", document: dict = None):
+        if fmt not in FORMATS:
+            raise ValueError(f"Format de sortie non supporté : {fmt}")
+        self.fmt = fmt
+        self._raw = fileobj
+        self._compressor = None
+        if fmt == "jsonl.zst":
+            import zstandard
+
+            self._compressor = zstandard.ZstdCompressor(level=3).stream_writer(fileobj, closefd=False)
+            fileobj = self._compressor
+        self._out = io.TextIOWrapper(fileobj, encoding="utf-8", write_through=True)
+        self._closed = False
+        self.count = 0
+
+        if fmt == "json":
+            self._out.write('{"pages": [')
+        else:
+            header = {"type": "document", **(document or {})}
+            self._out.write(json.dumps(header, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    def write_page(self, page: dict):
+        line = json.dumps(page, ensure_ascii=False, separators=(",", ":"))
+        if self.fmt == "json":
+            self._out.write(("," if self.count else "") + line)
+        else:
+            self._out.write(line + "\n")
+        self.count += 1
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self.fmt == "json":
+            self._out.write("]}")
+        self._out.flush()
+        self._out.detach()
+        if self._compressor is not None:
+            self._compressor.close()
+        self._raw.close()
+
+
+def iter_pages(path: Union[str, Path]) -> Iterator[dict]:
+    """Relit les pages d'un fichier .json, .jsonl ou .jsonl.zst, dans l'ordre."""
+    path = str(path)
+    if path.endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            yield from json.load(f).get("pages", [])
+        return
+
+    with open(path, "rb") as raw:
+        stream = raw
+        if path.endswith(".zst"):
+            import zstandard
+
+            stream = zstandard.ZstdDecompressor().stream_reader(raw)
+        for line in io.TextIOWrapper(stream, encoding="utf-8"):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record.get("type") == "document":
+                continue
+            yield record
@@ -8,6 +8,11 @@ from openai import OpenAI
 from pypdf import PdfReader
 import docx2txt
 from templates import INSTRUCTION_TEMPLATES
+import normalize
+import instrumentation
+import llm_cache
+import profiling
+from instrumentation import span
 
 # Load environment variables
 load_dotenv()
@@ -16,19 +21,23 @@ client = OpenAI(api_key=OPENAI_API_KEY)
 
 SUPPORTED_EXTS = [".pdf", ".md", ".txt", ".docx"]
 
-def extract_text(file_path: Path) -> str:
+def extract_pages(file_path: Path) -> list:
+    """Texte du fichier, page par page pour un PDF (une seule « page » sinon)."""
     ext = file_path.suffix.lower()
     if ext == ".pdf":
         with open(file_path, "rb") as f:
             reader = PdfReader(f)
-            return "\n".join(page.extract_text() for page in reader.pages if page.extract_text())
+            return [text for text in (page.extract_text() for page in reader.pages) if text]
     elif ext in [".md", ".txt"]:
-        return file_path.read_text(encoding="utf-8")
+        return [file_path.read_text(encoding="utf-8")]
     elif ext == ".docx":
-        return docx2txt.process(str(file_path))
+        return [docx2txt.process(str(file_path))]
     else:
         raise ValueError(f"❌ Type de fichier non supporté : {ext}")
 
+def extract_text(file_path: Path) -> str:
+    return "\n".join(extract_pages(file_path))
+
 def generate_dialogue(text: str, template_key: str) -> str:
     template = INSTRUCTION_TEMPLATES[template_key]
 
@@ -59,15 +68,25 @@ speaker-2: Très bien merci, et toi ?
 {template['dialog']}
 </podcast_dialogue>
 """
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "Tu es un créateur de podcasts en français. Tu produis des dialogues à deux voix."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.8,
-    )
-    return response.choices[0].message.content
+    messages = [
+        {"role": "system", "content": "Tu es un créateur de podcasts en français. Tu produis des dialogues à deux voix."},
+        {"role": "user", "content": prompt}
+    ]
+    with span("llm", api="openai_chat", model="gpt-4o-mini", step="dialogue") as s:
+        def call():
+            response = client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=messages,
+                temperature=0.8,
+            )
+            if response.usage is not None:
+                s.add(prompt_tokens=response.usage.prompt_tokens, output_tokens=response.usage.completion_tokens)
+            return response.choices[0].message.content
+
+        # Même texte, même template : le dialogue déjà généré est relu depuis le cache
+        content = llm_cache.complete(llm_cache.key("openai", "gpt-4o-mini", messages, temperature=0.8), call)
+        s.add(chars=len(content or ""))
+    return content
 
 def split_dialogue(text: str):
     lines = text.strip().splitlines()
@@ -89,14 +108,18 @@ def dialogue_to_audio_bytes(dialogue: list, voice1="alloy", voice2="echo", audio
         print(f"🎙️ Synthèse ligne {idx} [{speaker} - {voice}] → \"{speech[:60]}...\"")
 
         try:
-            with client.audio.speech.with_streaming_response.create(
-                model=audio_model,
-                voice=voice,
-                input=speech,
-                response_format="mp3"
-            ) as response:
+            with span("tts", api="openai_tts", model=audio_model, voice=voice) as s, \
+                    client.audio.speech.with_streaming_response.create(
+                        model=audio_model,
+                        voice=voice,
+                        input=speech,
+                        response_format="mp3"
+                    ) as response:
+                s.add(chars=len(speech))
                 for chunk in response.iter_bytes():
+                    s.mark("first_byte")
                     audio += chunk
+                    s.add(bytes=len(chunk))
         except Exception as e:
             print(f"❌ Échec synthèse [{speaker}] : {e}")
             continue
@@ -125,7 +148,16 @@ def main():
     parser.add_argument("--voice1", default="alloy", help="Voix pour speaker-1")
     parser.add_argument("--voice2", default="echo", help="Voix pour speaker-2")
     parser.add_argument("--audio-model", default="tts-1", help="Modèle audio OpenAI (tts-1, tts-1-hd, gpt-4o-mini-tts)")
+    normalize.add_arguments(parser)
+    llm_cache.add_arguments(parser)
+    instrumentation.add_arguments(parser)
+    profiling.add_arguments(parser)
     args = parser.parse_args()
+    llm_cache.configure(args)
+    with profiling.maybe_profile("podcastify", profiling.mode_from_args(args)):
+        run(args)
+
+def run(args: argparse.Namespace):
 
     input_path = Path(args.input)
     if not input_path.exists() or input_path.suffix.lower() not in SUPPORTED_EXTS:
@@ -133,7 +165,14 @@ def main():
         sys.exit(1)
 
     print("📖 Lecture du fichier...")
-    text = extract_text(input_path)
+    with span("read_input") as s:
+        pages = extract_pages(input_path)
+        s.add(pages=len(pages), chars=sum(len(p) for p in pages))
+    normalize_options = normalize.options_from_args(args, normalize.source_kind(input_path.name))
+    if normalize_options is not None:
+        pages, report = normalize.normalize_pages(pages, normalize_options)
+        normalize.print_report(input_path.name, report)
+    text = "\n".join(pages)
 
     print(f"🧠 Génération du dialogue ({args.template})...")
     transcript = generate_dialogue(text, args.template)
@@ -146,6 +185,7 @@ def main():
 
     base = input_path.stem
     save_files(base, audio, transcript)
+    instrumentation.report("podcastify", args.metrics)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,196 @@
+# coding: utf-8
+"""Profilage à la demande des points d'entrée du pipeline, sans toucher au code profilé.
+
+Deux modes :
+- `cprofile` : cProfile sur tous les threads créés pendant la mesure, fusionnés
+  dans un fichier `.pstats` (à ouvrir avec `python -m pstats` ou snakeviz), plus
+  un résumé texte trié par temps cumulé. À partir de Python 3.12, un seul cProfile
+  peut être actif à la fois : seul le thread principal est alors mesuré ;
+- `sample` : échantillonnage périodique des piles de tous les threads, écrit au
+  format « folded » (`.folded`) que lisent flamegraph.pl et speedscope.
+
+Dans les deux cas, le temps réel (wall) est comparé au temps CPU du processus, et
+les allocations sont suivies avec tracemalloc (pic et principales lignes allouantes).
+
+Scripts : options `--profile` et `--profile-mode cprofile|sample` (voir `add_arguments`).
+Fonctions (ex. callbacks Gradio) : décorateur `profiled`, actif seulement si la
+variable d'environnement PODCASTIFY_PROFILE vaut `cprofile` ou `sample`.
+"""
+import cProfile
+import functools
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Optional
+
+PROFILE_ENV = "PODCASTIFY_PROFILE"
+PROFILE_DIR_ENV = "PODCASTIFY_PROFILE_DIR"
+DEFAULT_DIR = "output/profiles"
+MODES = ("cprofile", "sample")
+# Depuis Python 3.12, cProfile passe par sys.monitoring : un second profileur actif
+# (un par thread) lève ValueError
+PER_THREAD_CPROFILE = sys.version_info < (3, 12)
+
+
+class _StackSampler(threading.Thread):
+    """Relève la pile de chaque thread toutes les `interval` secondes."""
+
+    def __init__(self, interval: float):
+        super().__init__(name="profiling-sampler", daemon=True)
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        own = threading.get_ident()
+        names = {}
+        labels = {}  # libellé par objet code : la pile est relevée des milliers de fois
+        while not self._stop_event.wait(self.interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    label = labels.get(code)
+                    if label is None:
+                        label = labels[code] = f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+                    stack.append(label)
+                    frame = frame.f_back
+                stack.append(names.get(ident, "thread"))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class Profiler:
+    """Contexte de profilage : `with Profiler("extraction"): ...` écrit ses fichiers en sortie."""
+
+    def __init__(self, name: str, mode: str = "cprofile", out_dir: Optional[str] = None,
+                 interval: float = 0.01, top: int = 30):
+        if mode not in MODES:
+            raise ValueError(f"Mode de profilage inconnu : {mode}")
+        self.name = name
+        self.mode = mode
+        self.out_dir = Path(out_dir or os.getenv(PROFILE_DIR_ENV) or DEFAULT_DIR)
+        self.interval = interval
+        self.top = top
+        self.paths = []
+        self._profiles = []
+        self._lock = threading.Lock()
+
+    def _start_thread_profile(self, frame, event, arg):
+        # Appelé une fois au démarrage de chaque nouveau thread : on y installe un cProfile dédié
+        sys.setprofile(None)
+        profile = cProfile.Profile()
+        with self._lock:
+            self._profiles.append(profile)
+        profile.enable()
+
+    def __enter__(self):
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self._tracemalloc = not tracemalloc.is_tracing()
+        if self._tracemalloc:
+            tracemalloc.start()
+        if self.mode == "cprofile":
+            if PER_THREAD_CPROFILE:
+                threading.setprofile(self._start_thread_profile)
+            else:
+                print("⚠️ Python 3.12+ : cProfile ne mesure que le thread principal, "
+                      "--profile-mode sample couvre tous les threads", file=sys.stderr)
+            main = cProfile.Profile()
+            self._profiles.append(main)
+            main.enable()
+        else:
+            self._sampler = _StackSampler(self.interval)
+            self._sampler.start()
+        self._wall0 = time.perf_counter()
+        self._cpu0 = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self._wall0
+        cpu = time.process_time() - self._cpu0
+        now = time.time()
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(now)) + f"-{int(now % 1 * 1000):03d}"
+        base = self.out_dir / f"{self.name}-{stamp}"
+
+        if self.mode == "cprofile":
+            if PER_THREAD_CPROFILE:
+                threading.setprofile(None)
+            self._profiles[0].disable()
+            with self._lock:
+                profiles = list(self._profiles)
+            stats = pstats.Stats(profiles[0])
+            for profile in profiles[1:]:
+                profile.disable()
+                try:
+                    stats.add(profile)
+                except TypeError:
+                    pass  # thread sans aucun appel mesuré
+            stats.dump_stats(f"{base}.pstats")
+            report = io.StringIO()
+            pstats.Stats(f"{base}.pstats", stream=report).sort_stats("cumulative").print_stats(self.top)
+            Path(f"{base}.txt").write_text(report.getvalue(), encoding="utf-8")
+            self.paths += [f"{base}.pstats", f"{base}.txt"]
+        else:
+            self._sampler.stop()
+            lines = [f"{stack} {n}" for stack, n in self._sampler.stacks.most_common()]
+            Path(f"{base}.folded").write_text("\n".join(lines) + "\n", encoding="utf-8")
+            self.paths.append(f"{base}.folded")
+
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        if self._tracemalloc:
+            tracemalloc.stop()
+        alloc = [f"wall {wall:.3f} s, cpu {cpu:.3f} s ({100 * cpu / wall if wall else 0:.0f} % CPU)",
+                 f"mémoire suivie : {current / 1024 ** 2:.1f} Mo à la fin, pic {peak / 1024 ** 2:.1f} Mo", ""]
+        alloc += [str(stat) for stat in snapshot.statistics("lineno")[:self.top]]
+        Path(f"{base}.alloc.txt").write_text("\n".join(alloc) + "\n", encoding="utf-8")
+        self.paths.append(f"{base}.alloc.txt")
+
+        print(f"🔬 Profil {self.name} ({self.mode}) : wall {wall:.2f} s, CPU {cpu:.2f} s, "
+              f"pic mémoire {peak / 1024 ** 2:.1f} Mo → {', '.join(self.paths)}", file=sys.stderr)
+        return False
+
+
+def add_arguments(parser):
+    """Options `--profile` et `--profile-mode` communes aux scripts du pipeline."""
+    parser.add_argument("--profile", action="store_true", help=f"Profiler l'exécution dans {DEFAULT_DIR}")
+    parser.add_argument("--profile-mode", choices=MODES,
+                        help="cprofile (défaut) ou sample pour un flamegraph ; implique --profile")
+
+
+def mode_from_args(args) -> Optional[str]:
+    """Mode de profilage d'après `add_arguments`, ou None sans profilage."""
+    if args.profile_mode:
+        return args.profile_mode
+    return "cprofile" if args.profile else None
+
+
+def maybe_profile(name: str, mode: Optional[str]):
+    """Profiler(name, mode) si `mode` est renseigné, sinon un contexte sans effet."""
+    return Profiler(name, mode) if mode else nullcontext()
+
+
+def profiled(name: Optional[str] = None):
+    """Décorateur : profile chaque appel si PODCASTIFY_PROFILE est défini (cprofile ou sample)."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            mode = os.getenv(PROFILE_ENV)
+            with maybe_profile(name or func.__name__, mode if mode in MODES else None):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -18,6 +18,9 @@ from tenacity import retry, retry_if_exception_type
 
 from functools import wraps
 
+from profiling import profiled
+import llm_cache
+
 import re
 
 import concurrent.futures as cf
@@ -484,6 +487,7 @@ def conditional_llm(
     return decorator
 
 
+@profiled()  # PODCASTIFY_PROFILE=cprofile|sample pour profiler chaque génération
 def generate_audio(
     files: list,
     openai_api_key: str = None,
@@ -583,8 +587,7 @@ def generate_audio(
     # Generate the dialogue using the LLM
    
     combined_text = "Langue : Français\n\n" + combined_text
-    llm_output = generate_dialogue(
-        combined_text,
+    dialogue_kwargs = dict(
         intro_instructions=intro_instructions,
         text_instructions=text_instructions,
         scratch_pad_instructions=scratch_pad_instructions,
@@ -593,6 +596,16 @@ def generate_audio(
         edited_transcript=edited_transcript_processed,
         user_feedback=user_feedback_processed
     )
+    # Même texte, mêmes instructions et même modèle : le dialogue est relu depuis le cache
+    # (PODCASTIFY_LLM_CACHE=off pour forcer une nouvelle génération)
+    dialogue_key = llm_cache.key(
+        "promptic", text_model,
+        {"template": generate_dialogue.__doc__, "text": combined_text, **dialogue_kwargs},
+        api_base=api_base, reasoning_effort=reasoning_effort, do_web_search=do_web_search,
+    )
+    llm_output = Dialogue.model_validate(llm_cache.complete(
+        dialogue_key, lambda: generate_dialogue(combined_text, **dialogue_kwargs).model_dump()
+    ))
 
     # Generate audio from the transcript
     audio = b""
@@ -734,6 +747,7 @@ def save_dialogue_edits(df, cached_dialogue):
     return new_dlg, gr.update(value=transcript_str), "Edits saved. Press *Re‑render* to hear them."
 
 
+@profiled()
 def render_audio_from_dialogue(
     cached_dialogue,                          # 👈 NEW: pass in as argument
     openai_api_key: str,
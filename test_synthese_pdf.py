@@ -1,7 +1,11 @@
 # test_synthese_pdf.py
+import concurrent.futures as cf
+import glob
 import os
 import sys
 import json
+import threading
+import time
 from dotenv import load_dotenv
 from google import genai
 from google.genai import types
@@ -10,32 +14,22 @@ import tqdm # Pour la barre de progression
 import re
 import argparse
 from pathlib import Path
+from pages_io import FORMATS, estimate_tokens, iter_pages
+import normalize
+import instrumentation
+import llm_cache
+import profiling
 load_dotenv()
-def main ():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--lang", default="fr", help="Langue de traitement")
-    parser.add_argument("--pdf", required=True, help="Nom du fichier PDF source")
-    args = parser.parse_args()   
-    pdf_name = Path(args.pdf).stem
-
-    
-    api_key = os.environ.get("GOOGLE_API_KEY")
-    if not api_key:
-        print("❌ GOOGLE_API_KEY manquant dans .env", file=sys.stderr)
-        sys.exit(1)
 
-    # Lit le JSON depuis stdin
-    data = json.load(sys.stdin)
-
-    try:
-        pages = data["pages"]
-        ocr_text = "\n\n".join(page.get("markdown", "") for page in pages)
-    except KeyError:
-        print("❌ Erreur : le champ 'pages' est manquant dans le JSON", file=sys.stderr)
-        sys.exit(1)
+def gemini_usage(usage) -> dict:
+    """Tokens facturés d'après `usage_metadata` (présent sur le dernier morceau du flux)."""
+    if usage is None:
+        return {}
+    return {"prompt_tokens": usage.prompt_token_count or 0, "output_tokens": usage.candidates_token_count or 0}
 
+def synthese_prompt(ocr_text: str) -> str:
     # Préfixe simple (à adapter avec un prompt plus élaboré)
-    prompt = f"""Titre de l'article :** Propose un titre pertinent, clair et accrocheur sur le sujet abordé.
+    return f"""Titre de l'article :** Propose un titre pertinent, clair et accrocheur sur le sujet abordé.
     - **Mots clés :** Identifie clairement 5 à 10 mots clés essentiels liés à l'article.
     - **Références :** Fournis une liste organisée de références à partir de sources fiables, en commençant impérativement par un article Wikipédia 
     puis en incluant des articles académiques, scientifiques ou de sites reconnus. Inclue les liens directs vers ces sources.
@@ -59,9 +53,390 @@ def main ():
     {ocr_text}
     """
 
-    client = genai.Client(api_key=api_key)
+MAP_PROMPT = """Tu prépares la synthèse d'un long document découpé en parties. Voici la partie {index} sur {total}.
+Rédige en Markdown un résumé détaillé et fidèle de cette partie : idées principales, définitions, chiffres,
+noms propres, exemples et références citées. N'ajoute rien qui ne figure pas dans le texte.
+Le début de la partie peut reprendre la fin de la précédente : ne le résume pas deux fois.
+
+{texte}
+"""
+
+BATCH_REPORT = "synthese_batch.json"
+SKIPPED_INPUTS = {"doublons.json", BATCH_REPORT}  # rapports d'Extraction.py et du mode --batch
+
+class RateLimiter:
+    """Limite globale d'appels par minute, partagée par tous les threads (0 : aucune limite)."""
+
+    def __init__(self, per_minute: float = 0):
+        self._lock = threading.Lock()
+        self._next = 0.0
+        self.set_rate(per_minute)
+
+    def set_rate(self, per_minute: float):
+        self.interval = 60 / per_minute if per_minute else 0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+RATE_LIMITER = RateLimiter()
+
+def user_contents(text: str) -> list:
+    return [types.Content(role="user", parts=[types.Part.from_text(text=text)])]
+
+def gemini_key(model: str, contents: list, config) -> str:
+    """Clé du cache LLM : modèle, contenus envoyés et paramètres de génération."""
+    return llm_cache.key("gemini", model, [c.model_dump(mode="json", exclude_none=True) for c in contents],
+                         **config.model_dump(mode="json", exclude_none=True))
+
+def gemini_complete(client, model: str, contents: list, config, step: str) -> str:
+    """Réponse Gemini complète (sans flux), servie par le cache LLM si possible."""
+    with instrumentation.span("llm", api="gemini", model=model, step=step) as llm_span:
+        def generate() -> str:
+            RATE_LIMITER.wait()
+            response = client.models.generate_content(model=model, contents=contents, config=config)
+            llm_span.add(**gemini_usage(response.usage_metadata))
+            return response.text or ""
+        text = llm_cache.complete(gemini_key(model, contents, config), generate)
+        llm_span.add(chars=len(text))
+    return text
+
+def gemini_stream(client, model: str, contents: list, config):
+    """Flux Gemini, rejoué depuis le cache LLM si la même requête a déjà abouti ;
+    la limite --rpm ne s'applique qu'aux vrais appels."""
+    def call():
+        RATE_LIMITER.wait()
+        return client.models.generate_content_stream(model=model, contents=contents, config=config)
+    return llm_cache.stream(gemini_key(model, contents, config), call)
+
+CONTINUE_PROMPT = "Continue exactement là où ta réponse s'est arrêtée, sans rien répéter ni ajouter d'introduction."
+
+class StreamWriter:
+    """Accumule une réponse en flux (liste de morceaux, jointe une seule fois) et l'ajoute
+    au fichier `<sortie>.partial` dès réception : une exécution interrompue n'y perd rien."""
+
+    def __init__(self, partial_path: Path, initial: str = ""):
+        self.path = partial_path
+        self.parts = [initial] if initial else []
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, "a" if self.parts else "w", encoding="utf-8")
+        return self
+
+    def write(self, text: str):
+        if text:
+            self.parts.append(text)
+            self._file.write(text)
+            self._file.flush()
+
+    def text(self) -> str:
+        return "".join(self.parts)
+
+    def __exit__(self, exc_type, exc, tb):
+        self._file.close()
+        if exc_type is not None:
+            print(f"💾 Réponse partielle conservée : {self.path} ({len(self.text())} caractères, "
+                  "--resume pour la reprendre)", file=sys.stderr)
+        return False
+
+class StreamProgress:
+    """Progression d'un flux en tokens réels (`usage_metadata`, estimés tant que le modèle
+    ne les donne pas), avec le délai avant le premier token et le débit."""
+
+    def __init__(self, desc: str, disable: bool = False):
+        self.bar = tqdm.tqdm(unit="tokens", desc=desc, disable=disable,
+                             bar_format="{desc}: {n_fmt} tokens [{elapsed}{postfix}]")
+        self.t0 = time.perf_counter()
+        self.ttft = None
+        self.tokens = 0
+        self._first_tokens = 0  # le débit est mesuré après le premier morceau
+
+    def update(self, chunk):
+        now = time.perf_counter()
+        if self.ttft is None:
+            self.ttft = now - self.t0
+        counted = getattr(chunk.usage_metadata, "candidates_token_count", None)
+        tokens = counted or self.tokens + estimate_tokens(chunk.text or "")
+        self.bar.update(tokens - self.tokens)
+        self.tokens = tokens
+        if not self._first_tokens:
+            self._first_tokens = tokens
+        self.bar.set_postfix_str(f"1er token {self.ttft:.1f} s, {self.rate():.0f} tokens/s")
+
+    def rate(self) -> float:
+        elapsed = time.perf_counter() - self.t0 - (self.ttft or 0)
+        return (self.tokens - self._first_tokens) / elapsed if elapsed > 0 else 0.0
+
+    def close(self):
+        self.bar.close()
+
+def stream_to_file(client, model: str, contents: list, config, path: Path, step: str,
+                   resume: bool = False, verbose: bool = True, on_text=None) -> str:
+    """Diffuse une réponse Gemini dans `path` via `<path>.partial`, renommé une fois le flux terminé.
+
+    Avec `resume`, une réponse partielle laissée par une exécution interrompue est
+    renvoyée au modèle, qui la continue au lieu de tout régénérer. `on_text` reçoit
+    le texte au fur et à mesure (réponse partielle reprise comprise).
+    """
+    partial = path.with_name(path.name + ".partial")
+    previous = partial.read_text(encoding="utf-8") if partial.exists() else ""
+    if previous and resume:
+        print(f"↩️ Reprise de {partial} ({len(previous)} caractères)", file=sys.stderr)
+        contents = contents + [types.Content(role="model", parts=[types.Part.from_text(text=previous)])] \
+            + user_contents(CONTINUE_PROMPT)
+    elif previous:
+        print(f"⚠️ {partial} (exécution interrompue) est remplacé ; --resume pour le reprendre", file=sys.stderr)
+        previous = ""
+
+    if previous and on_text:
+        on_text(previous)
+    progress = StreamProgress(f"Génération ({step})", disable=not verbose)
+    try:
+        with StreamWriter(partial, previous) as writer, \
+                instrumentation.span("llm", api="gemini", model=model, step=step) as llm_span:
+            usage = None
+            for chunk in gemini_stream(client, model, contents, config):
+                llm_span.mark("first_token")
+                progress.update(chunk)
+                writer.write(chunk.text)
+                if on_text and chunk.text:
+                    on_text(chunk.text)
+                usage = chunk.usage_metadata or usage
+            llm_span.add(chars=len(writer.text()) - len(previous), **gemini_usage(usage))
+    finally:
+        progress.close()
+    if progress.ttft is not None:
+        print(f"📈 {path.name} : {progress.tokens} tokens, 1er token {progress.ttft:.1f} s, "
+              f"{progress.rate():.0f} tokens/s", file=sys.stderr)
+    os.replace(partial, path)
+    return writer.text()
+
+SHORT_SUMMARY_MODES = ("serial", "parallel", "incremental")
+SHORT_SUMMARY_WORDS = 1200
+SECTION_RE = re.compile(r"^#{1,3} ", re.MULTILINE)
+SECTION_PROMPT = """Résume en {words} mots au plus cette section d'une synthèse, en gardant ses idées,
+définitions et chiffres essentiels. Réponds en Markdown, sans introduction ni conclusion.
+
+{texte}
+"""
+
+def short_summary_prompt(text: str) -> str:
+    return f"Résume ce texte en {SHORT_SUMMARY_WORDS} mots ou moins:\n\n{text}"
+
+class SectionSummarizer:
+    """Résumé court incrémental : chaque section de la synthèse est résumée dès que la suivante
+    commence, pendant que le flux continue. À la fin, il ne reste que la dernière section, plus
+    une condensation des résumés de section s'ils dépassent SHORT_SUMMARY_WORDS mots."""
+
+    # ≈ 1200 mots pour une synthèse d'environ 4000 mots (synthèse détaillée, références, quiz)
+    RATIO = SHORT_SUMMARY_WORDS / 4000
+
+    def __init__(self, client, model: str, executor: cf.Executor, min_chars: int = 2000,
+                 max_chars: int = 12000):
+        self.client = client
+        self.model = model
+        self.executor = executor
+        self.min_chars = min_chars  # sections plus courtes regroupées avec la suivante
+        self.max_chars = max_chars  # sans titre, coupe au dernier paragraphe au-delà de cette taille
+        self.config = types.GenerateContentConfig(temperature=0.5, max_output_tokens=2048)
+        self._parts = []
+        self._size = 0
+        self._futures = []
+
+    def feed(self, text: str):
+        self._parts.append(text)
+        self._size += len(text)
+        # On ne recolle le tampon que si une section a pu se terminer
+        if "#" not in text and self._size < self.max_chars:
+            return
+        pending = "".join(self._parts)
+        starts = [m.start() for m in SECTION_RE.finditer(pending) if m.start() >= self.min_chars]
+        boundary = starts[-1] if starts else (pending.rfind("\n\n") if self._size >= self.max_chars else -1)
+        if boundary < self.min_chars:
+            self._parts = [pending]
+            return
+        self._submit(pending[:boundary])
+        self._parts = [pending[boundary:]]
+        self._size = len(self._parts[0])
+
+    def _submit(self, section: str):
+        words = max(40, round(len(section.split()) * self.RATIO))
+        contents = user_contents(SECTION_PROMPT.format(words=words, texte=section))
+        self._futures.append(self.executor.submit(
+            gemini_complete, self.client, self.model, contents, self.config, "resume_section"))
+
+    def finish(self) -> str:
+        rest = "".join(self._parts)
+        if rest.strip():
+            self._submit(rest)
+        summary = "\n\n".join(future.result().strip() for future in self._futures)
+        if len(summary.split()) > SHORT_SUMMARY_WORDS:
+            config = types.GenerateContentConfig(temperature=0.5, max_output_tokens=8192)
+            summary = gemini_complete(self.client, self.model, user_contents(short_summary_prompt(summary)),
+                                      config, "resume_court")
+        return summary
+
+def chunk_pages(texts: list, max_tokens: int, overlap_tokens: int = 0) -> list:
+    """Regroupe des pages consécutives en morceaux d'environ `max_tokens` tokens (≈ 4 caractères
+    par token) ; chaque morceau reprend la fin du précédent sur `overlap_tokens` tokens, compris
+    dans `max_tokens`."""
+    max_chars = max(1, max_tokens * 4)
+    overlap_chars = min(max(0, overlap_tokens * 4), max_chars // 2)
+    # Place réservée au recouvrement et à son séparateur : aucun morceau ne dépasse max_chars
+    budget = max(1, max_chars - overlap_chars - 2) if overlap_chars else max_chars
+    # Une page plus longue qu'un morceau est elle-même découpée
+    pieces = [text[i:i + budget] for text in texts if text for i in range(0, len(text), budget)]
+
+    chunks, current, size = [], [], 0
+    for piece in pieces:
+        if current and size + len(piece) > budget:
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(piece)
+        size += len(piece) + 2
+    if current:
+        chunks.append("\n\n".join(current))
+
+    if overlap_chars:
+        chunks = chunks[:1] + [chunks[i - 1][-overlap_chars:] + "\n\n" + chunks[i] for i in range(1, len(chunks))]
+    return chunks
+
+def summarize_chunks(client, model: str, chunks: list, concurrency: int, max_output_tokens: int,
+                     progress: bool = True) -> list:
+    """Phase map : résume chaque morceau, au plus `concurrency` appels simultanés, dans l'ordre."""
+    config = types.GenerateContentConfig(temperature=0.3, max_output_tokens=max_output_tokens)
+
+    def summarize(index: int, chunk: str) -> str:
+        contents = user_contents(MAP_PROMPT.format(index=index + 1, total=len(chunks), texte=chunk))
+        return gemini_complete(client, model, contents, config, "map")
+
+    with cf.ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = [executor.submit(summarize, i, chunk) for i, chunk in enumerate(chunks)]
+        return [future.result() for future in tqdm.tqdm(futures, desc="Résumés partiels", unit="morceau",
+                                                         disable=not progress)]
+
+def map_reduce_source(client, model: str, texts: list, args: argparse.Namespace, progress: bool = True) -> str:
+    """Remplace le texte source par les résumés de ses morceaux ; si ces résumés dépassent
+    encore `--chunk-tokens`, ils sont à leur tour regroupés et résumés."""
+    level = 1
+    chunks = chunk_pages(texts, args.chunk_tokens, args.chunk_overlap)
+    while True:
+        print(f"🧩 Map (niveau {level}) : {len(chunks)} morceau(x) de ≤ {args.chunk_tokens} tokens, "
+              f"{args.map_concurrency} en parallèle", file=sys.stderr)
+        summaries = summarize_chunks(client, model, chunks, args.map_concurrency, args.map_output_tokens, progress)
+        joined = "\n\n".join(f"## Partie {i + 1}\n\n{summary}" for i, summary in enumerate(summaries))
+        if len(summaries) <= 1 or estimate_tokens(joined) <= args.chunk_tokens:
+            return joined
+        regrouped = chunk_pages(summaries, args.chunk_tokens)
+        if len(regrouped) >= len(chunks):
+            return joined  # les résumés ne se regroupent plus : inutile d'insister
+        chunks = regrouped
+        level += 1
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lang", default="fr", help="Langue de traitement")
+    parser.add_argument("--pdf", help="Nom du fichier PDF source (un seul document)")
+    parser.add_argument("--input", help="Pages extraites (.json, .jsonl ou .jsonl.zst) ; à défaut, JSON lu sur stdin")
+    parser.add_argument("--batch", metavar="DOSSIER|MOTIF",
+                        help="Synthétiser toutes les extractions d'un dossier ou d'un motif glob (ex. 'output/*.json')")
+    parser.add_argument("--out-dir", default="output", help="Dossier des synthèses en mode --batch")
+    parser.add_argument("--concurrency", type=int, default=3, help="Documents synthétisés simultanément en mode --batch")
+    parser.add_argument("--resume", action="store_true",
+                        help="Reprendre les réponses partielles (.partial) laissées par une exécution interrompue")
+    parser.add_argument("--rpm", type=float, default=0, help="Limite globale d'appels Gemini par minute (0 : aucune)")
+    parser.add_argument("--mode", choices=["direct", "map-reduce", "auto"], default="direct",
+                        help="direct : un seul appel ; map-reduce : résumés partiels en parallèle puis synthèse ; "
+                             "auto : map-reduce si le texte dépasse --chunk-tokens")
+    parser.add_argument("--chunk-tokens", type=int, default=30000, help="Taille des morceaux en mode map-reduce (tokens estimés)")
+    parser.add_argument("--chunk-overlap", type=int, default=500, help="Recouvrement entre morceaux consécutifs (tokens)")
+    parser.add_argument("--map-concurrency", type=int, default=4, help="Résumés partiels générés simultanément")
+    parser.add_argument("--short-summary", choices=SHORT_SUMMARY_MODES, default="serial",
+                        help="serial : résumé court après la synthèse ; parallel : en même temps, depuis le texte source ; "
+                             "incremental : section par section pendant la synthèse")
+    parser.add_argument("--map-output-tokens", type=int, default=4096, help="Longueur maximale de chaque résumé partiel")
+    normalize.add_arguments(parser)
+    llm_cache.add_arguments(parser)
+    instrumentation.add_arguments(parser)
+    profiling.add_arguments(parser)
+    return parser
+
+def main ():
+    parser = build_parser()
+    args = parser.parse_args()   
+    if not args.pdf and not args.batch:
+        parser.error("--pdf ou --batch est requis")
+    RATE_LIMITER.set_rate(args.rpm)
+    llm_cache.configure(args)
+    with profiling.maybe_profile("synthese", profiling.mode_from_args(args)):
+        if args.batch:
+            batch_synthese(args)
+        else:
+            synthese(args)
+
+def gemini_client():
+    api_key = os.environ.get("GOOGLE_API_KEY")
+    if not api_key:
+        print("❌ GOOGLE_API_KEY manquant dans .env", file=sys.stderr)
+        sys.exit(1)
+    return genai.Client(api_key=api_key)
+
+def synthese(args: argparse.Namespace):
+    pdf_name = Path(args.pdf).stem
+    client = gemini_client()
+
+    # Lit les pages depuis --input, ou le JSON depuis stdin
+    with instrumentation.span("read_input"):
+        if args.input:
+            data = {"pages": list(iter_pages(args.input))}
+        else:
+            data = json.load(sys.stdin)
+
+    try:
+        pages = data["pages"]
+        texts = [page.get("markdown", "") for page in pages]
+    except KeyError:
+        print("❌ Erreur : le champ 'pages' est manquant dans le JSON", file=sys.stderr)
+        sys.exit(1)
+
+    source = normalize.source_kind(args.input or args.pdf, pages)
+    synthesize_document(client, pdf_name, texts, args, source=source)
+    instrumentation.report("synthese", args.metrics)
+
+def synthesize_document(client, pdf_name: str, texts: list, args: argparse.Namespace,
+                        out_dir: str = ".", verbose: bool = True, source: str = "html") -> dict:
+    """Synthèse, version HTML et résumé court d'un document, écrits dans `out_dir`.
+
+    `source` (voir `normalize.source_kind`) règle le nettoyage du texte.
+    """
+    # Retire en-têtes/pieds de page, césures, références... avant d'envoyer au modèle
+    normalize_options = normalize.options_from_args(args, source)
+    if normalize_options is not None:
+        texts, report = normalize.normalize_pages(texts, normalize_options)
+        normalize.print_report(pdf_name, report)
+    ocr_text = "\n\n".join(texts)
+
     model = "gemini-2.5-flash-preview-04-17"
 
+    mode = args.mode
+    if mode == "auto":
+        mode = "map-reduce" if estimate_tokens(ocr_text) > args.chunk_tokens else "direct"
+    phases = {}
+    if mode == "map-reduce":
+        # Phase map : le long texte est remplacé par les résumés de ses morceaux
+        t0 = time.perf_counter()
+        with instrumentation.span("phase", phase="map"):
+            ocr_text = map_reduce_source(client, model, texts, args, progress=verbose)
+        phases["map"] = time.perf_counter() - t0
+    prompt = synthese_prompt(ocr_text)
+
     config = types.GenerateContentConfig(
         temperature=1,
         top_p=0.95,
@@ -69,14 +444,7 @@ def main ():
         max_output_tokens=65536,
         response_mime_type="text/plain",
     )
-    contents = [
-            types.Content(
-                role="user",
-                parts=[
-                    types.Part.from_text(text=prompt),
-                ],
-            ),
-        ]
+    contents = user_contents(prompt)
     full_response=""
     """
     for chunk in client.models.generate_content_stream(
@@ -89,58 +457,130 @@ def main ():
     html_output = markdown(full_response)
     """
 
-    # Estimation de la longueur de la réponse (approximative) - peut être ajustée
-    estimated_length = len(prompt) * 5  # On estime que la réponse sera 5 fois plus longue que le prompt
-
+    outputs = [Path(out_dir) / f"{pdf_name}{suffix}" for suffix in (".md", ".html", "_short.md")]
+    short_summary_config = types.GenerateContentConfig(
+                    temperature=0.5, # température plus basse pour plus de précision dans le résumé court
+                    max_output_tokens=8192,
+                )
 
-    with tqdm.tqdm(total=estimated_length, unit="tokens", desc="Génération en cours") as pbar:
-        full_response = "" # Accumule la réponse complète
-        for chunk in client.models.generate_content_stream(
-            model=model, contents=contents, config=config
-        ):
-            full_response += chunk.text  # Accumuler le texte
-            pbar.update(len(chunk.text))  # Mettre à jour la barre de progression
+    # Résumé court : après la synthèse (serial), ou en même temps qu'elle pour ne pas doubler la durée
+    short_mode = args.short_summary
+    with cf.ThreadPoolExecutor(max_workers=max(1, args.map_concurrency)) as executor:
+        short_future, sections = None, None
+        if short_mode == "parallel":
+            # Depuis le texte source (ou les résumés partiels en map-reduce), sans attendre la synthèse
+            short_future = executor.submit(stream_to_file, client, model, user_contents(short_summary_prompt(ocr_text)),
+                                           short_summary_config, outputs[2], "resume_court", args.resume, False)
+        elif short_mode == "incremental":
+            sections = SectionSummarizer(client, model, executor)
 
+        # En map-reduce, cet appel est la phase reduce : synthèse structurée à partir des résumés partiels
+        step = "synthese" if mode == "direct" else "reduce"
+        t0 = time.perf_counter()
+        full_response = stream_to_file(client, model, contents, config, outputs[0], step,
+                                       resume=args.resume, verbose=verbose,
+                                       on_text=sections.feed if sections else None)
         # Convertir le Markdown en HTML
         html_output = markdown(full_response)
+        phases[step] = time.perf_counter() - t0
 
-    # Recherche du résumé long dans la réponse complète (expression régulière à ajuster si besoin)
-    #summary_match = re.search(r"Synthèse détaillée \(3000 mots\) :[\s\n]*(.+?)[\n\n]+", full_response, re.DOTALL)
-    #long_summary = summary_match.group(1).strip() if summary_match else ""
-
-    short_summary=""      
-    # Générer un résumé court à partir du résumé long (ici avec un prompt simple)
-    short_summary_prompt = f"Résume ce texte en 1200 mots ou moins:\n\n{full_response}"
-    short_summary_config = types.GenerateContentConfig(
-                    temperature=0.5, # température plus basse pour plus de précision dans le résumé court
-                    max_output_tokens=8192,
-                )
+        # Recherche du résumé long dans la réponse complète (expression régulière à ajuster si besoin)
+        #summary_match = re.search(r"Synthèse détaillée \(3000 mots\) :[\s\n]*(.+?)[\n\n]+", full_response, re.DOTALL)
+        #long_summary = summary_match.group(1).strip() if summary_match else ""
 
-    short_summary_contents = [
-                types.Content(
-                    role="user",
-                    parts=[
-                        types.Part.from_text(text=short_summary_prompt),
-                    ],
-                ),
-            ]
-    short_summary_response = ""
-    for chunk in client.models.generate_content_stream(
-                    model=model,
-                    contents=short_summary_contents,
-                    config=short_summary_config,
-                ):
-                    short_summary_response += chunk.text
+        # Phase resume_court : temps restant une fois la synthèse terminée
+        t0 = time.perf_counter()
+        if short_mode == "parallel":
+            short_summary_response = short_future.result()
+        elif short_mode == "incremental":
+            short_summary_response = sections.finish()
+        else:
+            # Générer un résumé court à partir du résumé long (ici avec un prompt simple)
+            short_summary_response = stream_to_file(client, model, user_contents(short_summary_prompt(full_response)),
+                                                    short_summary_config, outputs[2], "resume_court",
+                                                    resume=args.resume, verbose=verbose)
     short_summary = short_summary_response.strip() # Résumé court final
-    print ( " Resumé court: \n ", short_summary)
+    phases["resume_court"] = time.perf_counter() - t0
+    print(f"⏱️ Durée par phase ({pdf_name}) : " + ", ".join(f"{name} {seconds:.1f} s" for name, seconds in phases.items()),
+          file=sys.stderr)
+    if verbose:
+        print ( " Resumé court: \n ", short_summary)
 
 
     # --- Enregistrement des sorties ---
-    # Sauvegarde des fichiers avec nom du PDF
-    Path(f"{pdf_name}.md").write_text(full_response, encoding="utf-8")
-    Path(f"{pdf_name}.html").write_text(html_output, encoding="utf-8")
-    Path(f"{pdf_name}_short.md").write_text(short_summary, encoding="utf-8")
-    print(f"✅ Fichiers générés : {pdf_name}.md, {pdf_name}.html, {pdf_name}_short.md")
+    # Sauvegarde des fichiers avec nom du PDF (la synthèse est déjà écrite au fil du flux)
+    outputs[1].write_text(html_output, encoding="utf-8")
+    outputs[2].write_text(short_summary, encoding="utf-8")
+    print(f"✅ Fichiers générés : {', '.join(str(path) for path in outputs)}", file=None if verbose else sys.stderr)
+    return {"document": pdf_name, "mode": mode, "short_summary": short_mode, "pages": len(texts),
+            "chars": len(full_response), "phases": phases, "outputs": [str(path) for path in outputs]}
+
+def document_name(path: Path) -> str:
+    """Nom du document d'après son fichier de pages (`x.jsonl.zst` → `x`)."""
+    for suffix in sorted(FORMATS.values(), key=len, reverse=True):
+        if path.name.endswith(suffix):
+            return path.name[:-len(suffix)]
+    return path.stem
+
+def batch_inputs(pattern: str) -> list:
+    """Fichiers de pages d'un dossier ou d'un motif glob, hors rapports."""
+    path = Path(pattern)
+    candidates = [p for p in path.iterdir() if p.is_file()] if path.is_dir() else [Path(p) for p in glob.glob(pattern)]
+    return sorted(p for p in candidates
+                  if p.name.endswith(tuple(FORMATS.values())) and p.name not in SKIPPED_INPUTS)
+
+def batch_synthese(args: argparse.Namespace):
+    """Synthétise plusieurs documents dans un seul processus : un client Gemini partagé,
+    `--concurrency` documents à la fois et la limite `--rpm` commune à tous les appels."""
+    paths = batch_inputs(args.batch)
+    if not paths:
+        print(f"❌ Aucun fichier de pages trouvé pour {args.batch}", file=sys.stderr)
+        sys.exit(1)
+    client = gemini_client()
+    out_dir = Path(args.out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    print(f"📚 {len(paths)} document(s) à synthétiser, {args.concurrency} en parallèle"
+          f"{f', {args.rpm:g} appels/min' if args.rpm else ''}", file=sys.stderr)
+
+    def run_one(path: Path) -> dict:
+        name = document_name(path)
+        t0 = time.perf_counter()
+        try:
+            with instrumentation.span("document", step="synthese"):
+                pages = list(iter_pages(path))
+                texts = [page.get("markdown", "") for page in pages]
+                result = synthesize_document(client, name, texts, args, out_dir=out_dir, verbose=False,
+                                             source=normalize.source_kind(str(path), pages))
+            result["status"] = "ok"
+        except Exception as e:
+            result = {"document": name, "status": "error", "error": f"{type(e).__name__}: {e}"}
+        result.update(input=str(path), duration=time.perf_counter() - t0)
+        return result
+
+    started = time.time()
+    results = []
+    with cf.ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as executor:
+        futures = [executor.submit(run_one, path) for path in paths]
+        for future in tqdm.tqdm(cf.as_completed(futures), total=len(futures), desc="Synthèses", unit="doc"):
+            result = future.result()
+            if result["status"] != "ok":
+                print(f"⚠️ Échec de la synthèse pour {result['document']} : {result['error']}", file=sys.stderr)
+            results.append(result)
+    results.sort(key=lambda r: r["input"])
+
+    failed = [r for r in results if r["status"] != "ok"]
+    report = {"started": started, "duration": time.time() - started, "documents": len(results),
+              "ok": len(results) - len(failed), "errors": len(failed), "results": results}
+    report_path = out_dir / BATCH_REPORT
+    report_path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    print(f"\n📊 Synthèses : {report['ok']}/{len(results)} réussie(s) en {report['duration']:.1f} s", file=sys.stderr)
+    for r in results:
+        detail = f"{r['mode']}, {r['pages']} pages, {r['chars']} caractères" if r["status"] == "ok" else r["error"]
+        print(f"   {'✅' if r['status'] == 'ok' else '❌'} {r['document']:<40} {r['duration']:>7.1f} s  {detail}",
+              file=sys.stderr)
+    print(f"📝 Rapport : {report_path}", file=sys.stderr)
+    instrumentation.report("synthese", args.metrics)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file